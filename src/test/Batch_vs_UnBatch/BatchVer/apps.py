@@ -1,27 +1,45 @@
 from flask import Flask, request, jsonify, render_template
 from web3 import Web3
 import json
-import hashlib
+import threading
 import time
+from async_verifier import MAX_CONCURRENCY, run_jobs
+from bulk_register import register_dids_bulk
+from data_store import DataStore
+from hash_store import open_hash_store
+from incremental_merkle import IncrementalMerkleTree
+from merkle_mmap import MappedMerkleTree
+from proof_cache import CachedProof, ProofCache
+from payload_stream import chunked, is_streamed_payload, iter_students
+from did_cache import DidIndexCache
+from merkle_tree import MerkleTree, compare_streams, get_multiproof
+from receipt_tracker import ReceiptTracker
+from rpc_batch import ReadError
+from sender_pool import SenderPool
+from sharded_batch import SHARD_SIZE, ShardedMerkleTree, verify_shards
 
 app = Flask(__name__)
 
-# Web3 setup
-w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:7545", request_kwargs={'timeout': 500}))
-contract_address = Web3.to_checksum_address('0xE3305FB46Af3405AaD6ce744Ce750A282906ba88')  # Replace with your deployed contract address
+# Serializes batches that update vp_merkle_state or mapped_tree, or commit roots on-chain
+merkle_state_lock = threading.Lock()
 
-# Load the contract ABI
-with open('e-transcript/build/contracts/SchnorrBatchVerification.json') as f:
-    contract_json = json.load(f)
-    contract_abi = contract_json['abi']
+# Memory-mapped tree of the last batch verified with tree_mode=mapped
+mapped_tree = None
 
-contract = w3.eth.contract(address=contract_address, abi=contract_abi)
+# Every student's proof, computed once per committed root and served by /merkle_proof/<did>
+proof_cache = ProofCache()
+
+# Number of accounts engine=pool spreads proof-check transactions over
+SENDER_ACCOUNTS = 4
 
 # Static variables for Schnorr proof
 G = 2  # Generator (example)
 P = 23  # Prime modulus (example)
 proof_verified = False  # To store the state of Schnorr proof verification
 
+# Number of contract reads sent per JSON-RPC batch request
+READ_CHUNK_SIZE = 200
+
 @app.route('/', methods=['GET'])
 def batch_ver_page():
     # Render the HTML form page for batch verification
@@ -35,26 +53,42 @@ def store_did_page():
 @app.route('/store_did_to_index', methods=['POST'])
 def store_did_to_index():
     try:
-        # Load the ipfs.json file to get DID and index information
-        with open('ipfs.json', 'r') as f:
-            ipfs_data = json.load(f)
-
-        # Loop through each student's DID and index
-        for index, student_data in ipfs_data.items():
-            student_did = student_data['student_did']
-            student_index = int(index)  # Convert index from string to integer
-
-            # Call the smart contract function to store DID and index
-            tx_hash = contract.functions.storeDidToIndex(student_did, student_index).transact({
-                'from': w3.eth.accounts[0], 'gas': 200000000
-            })
-            # Wait for the transaction to be mined
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            # print(f"Stored DID: {student_did} with index: {student_index} on the blockchain")
+        # Get DID and index information from the hash store
+        hash_store.refresh()
+
+        # "bulk" registers the DIDs in gas-bounded chunks with storeDidsToIndices,
+        # "single" sends one storeDidToIndex transaction per student
+        register_mode = request.values.get('register_mode', 'bulk')
+        entries = [(student_did, index) for index, student_did in hash_store.did_items()]
+
+        if register_mode == 'bulk':
+            result = register_dids_bulk(w3, contract, entries, w3.eth.accounts[0], tracker=receipt_tracker)
+        else:
+            start_time = time.time()
+            total_gas_used = 0
+            for student_did, student_index in entries:
+                # Call the smart contract function to store DID and index
+                tx_hash = contract.functions.storeDidToIndex(student_did, student_index).transact({
+                    'from': w3.eth.accounts[0], 'gas': 200000000
+                })
+                # Wait for the transaction to be mined
+                receipt = receipt_tracker.wait(tx_hash)
+                total_gas_used += receipt['gasUsed']
+            result = {
+                "registered": len(entries),
+                "transactions": len(entries),
+                "failed_transactions": [],
+                "total_gas_used": total_gas_used,
+                "wall_time": time.time() - start_time
+            }
+
+        # Pick up the new DidIndexed events right away instead of waiting for the next poll
+        did_cache.sync()
 
         return jsonify({
             "status": "success",
-            "message": "All DIDs and indices have been stored on the blockchain"
+            "message": f"{result['registered']} of {len(entries)} DIDs and indices have been stored on the blockchain",
+            **result
         })
 
     except Exception as e:
@@ -63,136 +97,365 @@ def store_did_to_index():
             "message": str(e)
         })
 
-# Helper function to compute SHA256 hash
-def sha256(data):
-    return hashlib.sha256(data.encode()).hexdigest()
-
-# Build the Merkle Tree
-def build_merkle_tree(hashed_vcs):
-    """ Constructs a Merkle Tree from a list of hashed VCs """
-    tree = []
-    current_layer = hashed_vcs
-
-    # While there's more than 1 node, reduce by hashing pairs
-    while len(current_layer) > 1:
-        tree.append(current_layer)
-        next_layer = []
-
-        # Hash pairs of nodes
-        for i in range(0, len(current_layer), 2):
-            # Handle odd-length layers by duplicating the last node
-            if i + 1 < len(current_layer):
-                combined_hash = sha256(current_layer[i] + current_layer[i + 1])
-            else:
-                combined_hash = sha256(current_layer[i] + current_layer[i])  # Duplicate last hash
-            next_layer.append(combined_hash)
-
-        current_layer = next_layer
-
-    tree.append(current_layer)  # Root is the only node left in the last layer
-    return tree
-
-# Retrieve Merkle root from the Merkle Tree
-def get_merkle_root(tree):
-    return tree[-1][0] if tree else None
-
-# Generate a Merkle proof for a particular index
-def get_merkle_proof(tree, index):
-    proof = []
-    for layer in tree[:-1]:  # Skip the last layer (the root)
-        if index % 2 == 0 and index + 1 < len(layer):
-            proof.append(layer[index + 1])
-        elif index % 2 == 1:
-            proof.append(layer[index - 1])
-        index //= 2
-    return proof
+@app.route('/did_cache/stats', methods=['GET'])
+def did_cache_stats():
+    # Report the cache size and hit/miss counters
+    return jsonify(did_cache.stats())
+
+@app.route('/merkle_proof/<path:student_did>', methods=['GET'])
+def merkle_proof(student_did):
+    # Serve a student's leaf and proof from the cache (optionally for an earlier ?root=0x...)
+    root = request.args.get('root')
+    try:
+        merkle_root = bytes.fromhex(root[2:] if root.startswith('0x') else root) if root else None
+    except ValueError:
+        return jsonify({"status": "failed", "message": "root must be a hex string"}), 400
+
+    cached = proof_cache.get(student_did, merkle_root)
+    if cached is None:
+        return jsonify({"status": "failed", "message": "No cached proof for this student and root"}), 404
+    return jsonify({
+        "status": "success",
+        "student_did": student_did,
+        "merkle_root": "0x" + (merkle_root or proof_cache.latest_root).hex(),
+        "leaf": "0x" + cached.leaf.hex(),
+        "proof": ["0x" + node.hex() for node in cached.proof]
+    })
+
+@app.route('/merkle_proof/stats', methods=['GET'])
+def merkle_proof_stats():
+    # Report the proof cache size and hit/miss counters
+    return jsonify(proof_cache.stats())
+
+@app.route('/sender_pool/stats', methods=['GET'])
+def sender_pool_stats():
+    # Report each pool account's next nonce and in-flight transactions
+    return jsonify(sender_pool.stats())
+
+@app.route('/receipt_tracker/stats', methods=['GET'])
+def receipt_tracker_stats():
+    # Report pending receipts and how many blocks and RPC batches resolved them
+    return jsonify(receipt_tracker.stats())
+
+@app.route('/did_cache/resync', methods=['POST'])
+def did_cache_resync():
+    try:
+        # Rebuild the DID -> index cache from every DidIndexed event on the chain
+        applied_events = did_cache.resync()
+        return jsonify({"status": "success", "applied_events": applied_events, **did_cache.stats()})
+    except Exception as e:
+        return jsonify({"status": "failed", "message": str(e)})
+
+# Run a view function with eth_call and report its gas with estimate_gas instead of mining it
+def call_view(contract_function, estimate_gas=True):
+    tx_params = {'from': w3.eth.accounts[0]}
+    result = contract_function.call(tx_params)
+    gas_used = contract_function.estimate_gas(tx_params) if estimate_gas else 0
+    return result, gas_used
+
+# Mine a contract call and report whether it succeeded and the gas it used
+def transact_and_wait(contract_function):
+    tx_hash = contract_function.transact({'from': w3.eth.accounts[0], 'gas': 200000000})
+    receipt = receipt_tracker.wait(tx_hash)
+    return receipt['status'] == 1, receipt['gasUsed']
+
+# Verify each student's Merkle proof separately (proofs[i] is the CachedProof of students[i])
+def verify_single_proofs(proofs, students, verify_mode, estimate_gas):
+    valid_students = []
+    gas_used = 0
+    for cached, student in zip(proofs, students):
+        # Verify VP proof on the blockchain
+        verify_call = contract.functions.verifyMerkleProof(cached.proof, cached.leaf)
+        if verify_mode == 'transact':
+            is_valid, proof_gas = transact_and_wait(verify_call)
+        else:
+            is_valid, proof_gas = call_view(verify_call, estimate_gas)
+        gas_used += proof_gas
+
+        if is_valid:
+            valid_students.append({
+                "student_did": student.student_did,
+                "status": "verified and VC valid"
+            })
+    return valid_students, gas_used
+
+# Verify each student's Merkle proof concurrently on the asyncio engine
+def verify_single_proofs_async(proofs, students, verify_mode, estimate_gas, max_concurrency):
+    async def verify_one(engine, cached):
+        proof_args = (cached.proof, cached.leaf)
+        if verify_mode == 'transact':
+            return await engine.transact('verifyMerkleProof', *proof_args)
+        return await engine.call('verifyMerkleProof', *proof_args, estimate_gas=estimate_gas)
+
+    # Every check is sent concurrently and the receipts are awaited together
+    results = run_jobs(
+        w3.provider.endpoint_uri, contract_address, contract_abi,
+        verify_one, proofs, max_concurrency=max_concurrency
+    )
+    return collect_proof_results(students, results)
+
+# Verify each student's Merkle proof on a thread pool, spreading the transactions over the sender pool's accounts
+def verify_single_proofs_pooled(proofs, students, verify_mode, estimate_gas, senders):
+    def verify_one(cached):
+        verify_call = contract.functions.verifyMerkleProof(cached.proof, cached.leaf)
+        if verify_mode == 'transact':
+            receipt = sender_pool.transact(verify_call, gas=200000000, senders=senders)
+            return receipt['status'] == 1, receipt['gasUsed']
+        return call_view(verify_call, estimate_gas)
+
+    return collect_proof_results(students, sender_pool.map(verify_one, proofs, senders=senders))
+
+# Split concurrent (is_valid, gas) results into valid and failed students
+def collect_proof_results(students, results):
+    valid_students = []
+    invalid_students = []
+    gas_used = 0
+    for student, result in zip(students, results):
+        if isinstance(result, Exception):
+            invalid_students.append({
+                "student_did": student.student_did,
+                "status": f"verification failed: {result}"
+            })
+            continue
+        is_valid, proof_gas = result
+        gas_used += proof_gas
+        if is_valid:
+            valid_students.append({
+                "student_did": student.student_did,
+                "status": "verified and VC valid"
+            })
+    return valid_students, invalid_students, gas_used
+
+# Verify every student's leaf at once with a single Merkle multiproof
+def verify_multi_proof(merkle_tree, proofs, students, verify_mode, estimate_gas):
+    multiproof = get_multiproof(merkle_tree, range(len(students)))
+    verify_call = contract.functions.verifyMerkleMultiProof(
+        multiproof.leaves,
+        multiproof.indices,
+        multiproof.proof,
+        multiproof.leaf_count
+    )
+
+    # Read the boolean result; in transact mode also mine the call once to measure the batch gas
+    batch_ok, gas_used = call_view(verify_call, estimate_gas and verify_mode != 'transact')
+    if verify_mode == 'transact':
+        _, gas_used = transact_and_wait(verify_call)
+
+    valid_students = []
+    for cached, student in zip(proofs, students):
+        # If the batch failed, fall back to a read-only single proof to find the bad leaves
+        if batch_ok or contract.functions.verifyMerkleProof(cached.proof, cached.leaf).call():
+            valid_students.append({
+                "student_did": student.student_did,
+                "status": "verified and VC valid"
+            })
+    return valid_students, gas_used
 
 @app.route('/batch_verify_json', methods=['POST'])
 def batch_verify_from_json():
     global proof_verified  # Track Schnorr proof state globally
+    global mapped_tree
     cumulative_gas_used = 0  # Initialize cumulative gas counter
     invalid_students = []  # List to hold invalid students
     try:
-        # Load data
-        with open('batch_verification_payload.json', 'r') as f:
-            students_data = json.load(f)['students']
-
-        with open('token.json', 'r') as f:
-            token_data = json.load(f)
-
-        with open('ipfs.json', 'r') as f:
-            ipfs_data = json.load(f)
+        # Load data (parsed once and re-parsed only when a file changes on disk)
+        if is_streamed_payload(request):
+            # Students streamed in the request body (NDJSON or a JSON array) are parsed as they arrive.
+            # Only the parsing is streamed: the whole batch's root is committed before any proof is
+            # checked, so its leaves, proofs and results are still held for the whole batch
+            students_data = iter_students(request.stream, request.mimetype)
+        else:
+            students_data = data_store.payload.get()
+        tokens = data_store.tokens.get()
+        hash_store.refresh()  # Pick up records appended by hash_vc.py since the last request
+
+        # "single" sends one verifyMerkleProof per student, "multi" one verifyMerkleMultiProof per batch,
+        # "sharded" splits the batch into shard_size sub-trees committed and checked on their own
+        # from shard_senders accounts in parallel, under one root of roots
+        proof_mode = request.values.get('proof_mode', 'single')
+        shard_size = int(request.values.get('shard_size', SHARD_SIZE))
+        if shard_size < 1:
+            return jsonify({"status": "failed", "message": "shard_size must be at least 1"}), 400
+        shard_senders = w3.eth.accounts[:max(1, int(request.values.get('shard_senders', 4)))]
+        # "incremental" updates the persisted trees in place, "rebuild" builds fresh trees for the batch in RAM,
+        # "mapped" builds them into memory-mapped files (for cohorts too large to hold every layer in RAM).
+        # Multiproofs rely on dense leaf positions, so in incremental mode they use a freshly built tree
+        tree_mode = request.values.get('tree_mode', 'incremental')
+        # Only matching hashed VCs become leaves, so the IPFS tree would be a copy of the VP tree:
+        # "shared" commits the VP root for both, "stream" recomputes the IPFS root from the hash store
+        # in one pass that also checks it against the VP leaves (in O(log n) memory, rebuilt trees only)
+        ipfs_root_mode = request.values.get('ipfs_root', 'shared')
+        # Processes used to build large trees in rebuild mode (defaults to one per core, 1 builds serially)
+        build_workers = int(request.values.get('build_workers', 0)) or None
+        # "call" checks proofs with eth_call and reads the returned boolean, "transact" mines every check
+        verify_mode = request.values.get('verify_mode', 'call')
+        # In call mode, gas is reported from estimate_gas; set estimate_gas=0 to skip it
+        estimate_gas = request.values.get('estimate_gas', '1') != '0'
+        # "sync" checks one proof after another, "async" runs them concurrently on AsyncWeb3,
+        # "pool" runs them on threads with the transactions spread over several sender accounts
+        engine = request.values.get('engine', 'sync')
+        max_concurrency = int(request.values.get('max_concurrency', MAX_CONCURRENCY))
+        senders = int(request.values.get('senders', SENDER_ACCOUNTS))
 
         valid_students = []
         start_time = time.time()
 
-        # Collect hashed VCs from IPFS and VP separately
-        hashed_vcs_ipfs = []
+        # Collect the hashed VCs that matched between IPFS and the VP (as raw 32-byte leaves)
         hashed_vcs_vp = []
+        verified_students = []  # Students whose hashed VC matched, in leaf order
+        verified_indices = []  # Student index of each verified student
+
+        # Work through the students chunk by chunk as they are read, so lookups start before the
+        # last student has arrived; each chunk's index lookups hit the local cache (misses go out
+        # as batched JSON-RPC reads)
+        read_chunk_size = int(request.values.get('read_chunk_size', READ_CHUNK_SIZE))
+        for students_chunk in chunked(students_data, read_chunk_size):
+            student_indices = did_cache.lookup_many(
+                [student.student_did for student in students_chunk],
+                chunk_size=read_chunk_size
+            )
+
+            for student, student_index in zip(students_chunk, student_indices):
+                if isinstance(student_index, ReadError):
+                    # A failed lookup only fails this student
+                    invalid_students.append({
+                        "student_did": student.student_did,
+                        "status": f"DID lookup failed: {student_index}"
+                    })
+                    continue
+
+                # Retrieve hashed VC from the hash store and from the VP using the index
+                ipfs_hashed_vc = hash_store.get(student_index)  # O(1) slice of the memory map
+                presentation = tokens.by_index.get(student_index)
+                if ipfs_hashed_vc is None or presentation is None:
+                    invalid_students.append({
+                        "student_did": student.student_did,
+                        "status": "No hashed VC stored for this student"
+                    })
+                    continue
+                vp_hashed_vc = presentation.vp_hashed_vc  # Get hashed VC from the VP
+
+                # Compare hashed VC from VP and hashed VC from IPFS
+                if vp_hashed_vc != ipfs_hashed_vc:
+                    # Log invalid student but continue to next
+                    invalid_students.append({
+                        "student_did": student.student_did,
+                        "status": "Hashed VC mismatch"
+                    })
+                    continue  # Skip to the next student
+
+                hashed_vcs_vp.append(vp_hashed_vc)
+                verified_students.append(student)
+                verified_indices.append(student_index)
+
+        changed_leaves = None
+        shard_report = None
+        if verified_students and proof_mode == 'sharded':
+            sharded_tree = ShardedMerkleTree.build(hashed_vcs_vp, shard_size, workers=build_workers)
+            proof_cache.put_many(sharded_tree.root, {
+                student.student_did: CachedProof(sharded_tree.leaf(i), sharded_tree.proof(i))
+                for i, student in enumerate(verified_students)
+            })
 
-        for student in students_data:
-            student_did = student['student_did']
-            student_index = contract.functions.getIndexByDid(student_did).call()
-
-            # Retrieve hashed VC from ipfs.json using the index
-            ipfs_hashed_vc = ipfs_data[str(student_index)]['hashed_vc']  # Get the hashed VC from IPFS data
-            vp_hashed_vc = token_data[str(student_index)]['verifiablePresentation']['verifiableCredential'][0]['hash']  # Get hashed VC from the VP
-
-            # Compare hashed VC from VP and hashed VC from IPFS
-            if vp_hashed_vc != ipfs_hashed_vc:
-                # Log invalid student but continue to next
-                invalid_students.append({
-                    "student_did": student['student_did'],
-                    "status": "Hashed VC mismatch"
-                })
-                continue  # Skip to the next student
-
-            # Append both hashed VCs to their respective lists
-            hashed_vcs_ipfs.append(ipfs_hashed_vc)
-            hashed_vcs_vp.append(vp_hashed_vc)
-
-        # Construct the Merkle Trees
-        ipfs_merkle_tree = build_merkle_tree(hashed_vcs_ipfs)
-        vp_merkle_tree = build_merkle_tree(hashed_vcs_vp)
-
-        # Retrieve Merkle Roots
-        ipfs_merkle_root = get_merkle_root(ipfs_merkle_tree)
-        vp_merkle_root = get_merkle_root(vp_merkle_tree)
-
-        # Convert Merkle roots to bytes32
-        ipfs_merkle_root_bytes32 = bytes.fromhex(ipfs_merkle_root)
-        vp_merkle_root_bytes32 = bytes.fromhex(vp_merkle_root)
-
-        # Submit both roots to the blockchain
-        tx_hash = contract.functions.setMerkleRoots(
-            ipfs_merkle_root_bytes32, 
-            vp_merkle_root_bytes32
-        ).transact({
-            'from': w3.eth.accounts[0], 'gas': 200000000
-        })
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        cumulative_gas_used += receipt['gasUsed']  # Add the gas used for this transaction
-
-        # Generate the Merkle Proof for each student
-        for i, student in enumerate(students_data):
-            # Get Merkle Proofs from both IPFS and VP trees
-            merkle_proof_vp = get_merkle_proof(vp_merkle_tree, i)
-
-            # Verify VP proof on the blockchain
-            tx_hash = contract.functions.verifyMerkleProof(
-                [bytes.fromhex(p) for p in merkle_proof_vp], 
-                bytes.fromhex(hashed_vcs_vp[i])
-            ).transact({'from': w3.eth.accounts[0], 'gas': 200000000})
-
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            cumulative_gas_used += receipt['gasUsed']  # Add the gas used for this transaction
-
-            if receipt['status'] == 1:
-                valid_students.append({
-                    "student_did": student['student_did'],
+            # The sharded root and shard roots on-chain are shared by every request: hold the lock
+            # from committing them until the last shard has been checked
+            with merkle_state_lock:
+                gas_used, shard_results = verify_shards(
+                    w3, contract, sharded_tree, shard_senders, verify_mode, estimate_gas, tracker=receipt_tracker
+                )
+            cumulative_gas_used += gas_used
+            for result in shard_results:
+                cumulative_gas_used += result.gas_used
+                valid_students.extend({
+                    "student_did": verified_students[i].student_did,
                     "status": "verified and VC valid"
+                } for i in result.valid)
+                if result.error is not None:
+                    # A shard that still failed after its retries only fails its own students
+                    invalid_students.extend({
+                        "student_did": verified_students[i].student_did,
+                        "status": f"shard {result.shard_index} failed: {result.error}"
+                    } for i in sharded_tree.shard_range(result.shard_index))
+            shard_report = [result.to_dict() for result in shard_results]
+
+        elif verified_students:
+            # The persisted and mapped trees, and the roots committed on-chain, are shared by every request:
+            # hold the lock from updating the tree until the last proof against it has been checked
+            with merkle_state_lock:
+                if tree_mode == 'mapped':
+                    # Build the tree layer by layer on disk with bounded memory
+                    if mapped_tree is not None:
+                        mapped_tree.close()
+                    mapped_tree = MappedMerkleTree.build('vp_merkle_tree.bin', hashed_vcs_vp)
+                    vp_merkle_tree = mapped_tree
+                    leaf_positions = range(len(verified_students))
+                elif proof_mode == 'multi' or tree_mode == 'rebuild':
+                    # Construct the Merkle Tree (keccak256 over sorted pairs, same as the contract);
+                    # large batches hash their lower layers in a process pool
+                    vp_merkle_tree = MerkleTree.build_parallel(hashed_vcs_vp, workers=build_workers)
+                    leaf_positions = range(len(verified_students))
+                else:
+                    # Bring the persisted tree to this batch; only added, changed or dropped leaves are rehashed
+                    vp_merkle_tree = vp_merkle_state
+                    changed_leaves = vp_merkle_tree.sync(dict(zip(verified_indices, hashed_vcs_vp)))
+                    vp_merkle_tree.flush()
+                    leaf_positions = verified_indices
+                del hashed_vcs_vp  # The tree holds the leaves now
+
+                ipfs_merkle_root = vp_merkle_tree.root
+                if ipfs_root_mode == 'stream' and isinstance(leaf_positions, range):
+                    # Fold the IPFS side from the hash store while walking the VP leaves, stopping at the first difference
+                    mismatch, ipfs_merkle_root = compare_streams(
+                        (hash_store.get(index) for index in verified_indices),
+                        (vp_merkle_tree.leaf(i) for i in leaf_positions)
+                    )
+                    if mismatch is not None:
+                        raise ValueError(
+                            f"IPFS hashed VC of {verified_students[mismatch].student_did} changed during verification"
+                        )
+
+                # Submit both roots to the blockchain (roots are already bytes32),
+                # unless the contract already holds them from an unchanged earlier batch
+                if (contract.functions.ipfsMerkleRoot().call() != ipfs_merkle_root
+                        or contract.functions.vpMerkleRoot().call() != vp_merkle_tree.root):
+                    tx_hash = contract.functions.setMerkleRoots(
+                        ipfs_merkle_root,
+                        vp_merkle_tree.root
+                    ).transact({
+                        'from': w3.eth.accounts[0], 'gas': 200000000
+                    })
+                    receipt = receipt_tracker.wait(tx_hash)
+                    cumulative_gas_used += receipt['gasUsed']  # Add the gas used for this transaction
+
+                # Compute every student's proof once; the checks below and /merkle_proof/<did> reuse them
+                proofs = [CachedProof(vp_merkle_tree.leaf(i), vp_merkle_tree.proof(i)) for i in leaf_positions]
+                proof_cache.put_many(vp_merkle_tree.root, {
+                    student.student_did: cached for student, cached in zip(verified_students, proofs)
                 })
 
+                if proof_mode == 'multi':
+                    # One multiproof check for the whole batch
+                    batch_valid, gas_used = verify_multi_proof(
+                        vp_merkle_tree, proofs, verified_students, verify_mode, estimate_gas
+                    )
+                elif engine == 'async':
+                    # One proof check per student, sent concurrently
+                    batch_valid, batch_invalid, gas_used = verify_single_proofs_async(
+                        proofs, verified_students, verify_mode, estimate_gas, max_concurrency
+                    )
+                    invalid_students.extend(batch_invalid)
+                elif engine == 'pool':
+                    # One proof check per student, several accounts sending at once
+                    batch_valid, batch_invalid, gas_used = verify_single_proofs_pooled(
+                        proofs, verified_students, verify_mode, estimate_gas, senders
+                    )
+                    invalid_students.extend(batch_invalid)
+                else:
+                    # One proof check per student
+                    batch_valid, gas_used = verify_single_proofs(proofs, verified_students, verify_mode, estimate_gas)
+                valid_students.extend(batch_valid)
+                cumulative_gas_used += gas_used
+
         verification_time = time.time() - start_time
 
         return jsonify({
@@ -200,7 +463,9 @@ def batch_verify_from_json():
             "valid_students": valid_students,
             "invalid_students": invalid_students,  # Return the invalid students as well
             "verification_time": verification_time,
-            "cumulative_gas_used": cumulative_gas_used  # Return the total gas used
+            "cumulative_gas_used": cumulative_gas_used,  # Return the total gas used
+            "changed_leaves": changed_leaves,  # Leaves rehashed in incremental mode (None otherwise)
+            "shards": shard_report  # Per-shard outcome in sharded mode (None otherwise)
         })
 
     except Exception as e:
@@ -208,4 +473,39 @@ def batch_verify_from_json():
 
 
 if __name__ == '__main__':
+    # Start-up side effects run only here: the process pool's spawned Merkle workers import this
+    # file as __mp_main__ and must not reconnect to the node or start the background threads again
+
+    # Web3 setup
+    w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:7545", request_kwargs={'timeout': 500}))
+    contract_address = Web3.to_checksum_address('0xE3305FB46Af3405AaD6ce744Ce750A282906ba88')  # Replace with your deployed contract address
+
+    # Load the contract ABI
+    with open('e-transcript/build/contracts/SchnorrBatchVerification.json') as f:
+        contract_json = json.load(f)
+        contract_abi = contract_json['abi']
+
+    contract = w3.eth.contract(address=contract_address, abi=contract_abi)
+
+    # Parsed token.json / payload, reloaded only when a file changes
+    data_store = DataStore()
+
+    # Hashed VCs from IPFS as fixed-width binary records, looked up by index through a memory map
+    hash_store = open_hash_store()
+
+    # DID -> index cache, seeded from DidIndexed events on startup and kept current in the background
+    did_cache = DidIndexCache(w3, contract)
+    did_cache.start()
+
+    # Merkle tree of the last verified batch, kept on disk with leaf slot i holding student index i
+    # so a follow-up batch only rehashes the leaves that changed
+    vp_merkle_state = IncrementalMerkleTree('vp_merkle.bin')
+
+    # Receipts of every transaction the app sends, resolved from new blocks by one background thread
+    receipt_tracker = ReceiptTracker(w3)
+    receipt_tracker.start()
+
+    # Accounts engine=pool spreads proof-check transactions over, starting at accounts[0]
+    sender_pool = SenderPool(w3, w3.eth.accounts[:SENDER_ACCOUNTS], tracker=receipt_tracker)
+
     app.run(debug=True)
@@ -0,0 +1,75 @@
+import time
+
+# Gas budget for one storeDidsToIndices transaction (kept under Ganache's default block gas limit)
+CHUNK_GAS_LIMIT = 6000000
+# Entries in the chunk whose estimate_gas sizes the others
+PROBE_ENTRIES = 16
+# Share of the chunk budget the estimate may fill; DIDs longer than the probe's cost a little more
+GAS_HEADROOM = 0.9
+# Rough cost of one registration, used only when the node cannot estimate the probe chunk
+GAS_PER_ENTRY = 60000
+# Fixed cost of a transaction plus array decoding (fallback sizing only)
+BASE_TX_GAS = 60000
+
+
+# Entries per chunk: measured from estimate_gas on a small probe chunk, or the fixed guess if that fails
+def entries_per_chunk(contract, entries, sender, chunk_gas_limit=CHUNK_GAS_LIMIT):
+    probe = entries[:PROBE_ENTRIES]
+    if not probe:
+        return 1
+    try:
+        gas = contract.functions.storeDidsToIndices(
+            [did for did, _ in probe],
+            [index for _, index in probe]
+        ).estimate_gas({'from': sender})
+        # The estimate includes the fixed per-transaction cost, so this slightly undersizes the chunks
+        return max(1, int(chunk_gas_limit * GAS_HEADROOM) * len(probe) // gas)
+    except Exception:
+        return max(1, (chunk_gas_limit - BASE_TX_GAS) // GAS_PER_ENTRY)
+
+
+# Split (did, index) entries into chunks of per_chunk entries
+def chunk_entries(entries, per_chunk):
+    return [entries[i:i + per_chunk] for i in range(0, len(entries), per_chunk)]
+
+
+def register_dids_bulk(w3, contract, entries, sender, chunk_gas_limit=CHUNK_GAS_LIMIT, tracker=None):
+    """ Registers (did, index) entries with storeDidsToIndices, in chunks sized from the node's gas estimate.
+    Chunks are sent back-to-back with locally managed nonces and all receipts are collected at the end
+    (from new blocks in one go when a ReceiptTracker is given). """
+    start_time = time.time()
+    chunks = chunk_entries(entries, entries_per_chunk(contract, entries, sender, chunk_gas_limit))
+
+    # Take the next nonce once and count up locally instead of waiting for each transaction to be mined
+    nonce = w3.eth.get_transaction_count(sender, 'pending')
+    pending = []
+    for chunk in chunks:
+        tx_hash = contract.functions.storeDidsToIndices(
+            [did for did, _ in chunk],
+            [index for _, index in chunk]
+        ).transact({'from': sender, 'nonce': nonce, 'gas': chunk_gas_limit})
+        pending.append((tx_hash, len(chunk)))
+        nonce += 1
+
+    # Collect the receipts once everything has been submitted
+    registered = 0
+    total_gas_used = 0
+    failed_transactions = []
+    if tracker is not None:
+        receipts = tracker.wait_all([tx_hash for tx_hash, _ in pending])
+    else:
+        receipts = [w3.eth.wait_for_transaction_receipt(tx_hash) for tx_hash, _ in pending]
+    for (tx_hash, size), receipt in zip(pending, receipts):
+        total_gas_used += receipt['gasUsed']
+        if receipt['status'] == 1:
+            registered += size
+        else:
+            failed_transactions.append(tx_hash.hex())
+
+    return {
+        "registered": registered,
+        "transactions": len(pending),
+        "failed_transactions": failed_transactions,
+        "total_gas_used": total_gas_used,
+        "wall_time": time.time() - start_time
+    }
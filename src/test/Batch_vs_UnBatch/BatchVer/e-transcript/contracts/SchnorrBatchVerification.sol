@@ -13,13 +13,31 @@ contract SchnorrBatchVerification {
     bytes32 public ipfsMerkleRoot;
     bytes32 public vpMerkleRoot;
 
+    // Root over the shard roots of a sharded batch, and each shard's root committed under it
+    bytes32 public shardedMerkleRoot;
+    uint256 public shardCount;
+    mapping(bytes32 => mapping(uint256 => bytes32)) public shardRoots;
+
     // Events for logging important actions (Merkle root updates, debugging)
     event MerkleRootUpdated(bytes32 ipfsRoot, bytes32 vpRoot);
     event ProofVerified(bool isValid, string studentDid);
+    event DidIndexed(string studentDid, uint256 index);  // Lets off-chain caches follow the DID -> index mapping
+    event ShardedRootUpdated(bytes32 root, uint256 shardCount);
+    event ShardRootCommitted(bytes32 shardedRoot, uint256 shardIndex, bytes32 shardRoot);
     
     // Store a student's DID and its corresponding index
     function storeDidToIndex(string calldata studentDid, uint256 index) external {
         didToIndex[studentDid] = index;
+        emit DidIndexed(studentDid, index);
+    }
+
+    // Store many students' DIDs and indices in one transaction
+    function storeDidsToIndices(string[] calldata studentDids, uint256[] calldata indices) external {
+        require(studentDids.length == indices.length, "DID and index counts differ");
+        for (uint256 i = 0; i < studentDids.length; i++) {
+            didToIndex[studentDids[i]] = indices[i];
+            emit DidIndexed(studentDids[i], indices[i]);
+        }
     }
 
     // Retrieve the index of a student using their DID
@@ -34,6 +52,47 @@ contract SchnorrBatchVerification {
         emit MerkleRootUpdated(ipfsRoot, vpRoot);  // Emit an event to indicate that the Merkle roots have been updated
     }
 
+    // Function to store the root over all shard roots of a sharded batch
+    function setShardedRoot(bytes32 root, uint256 count) external {
+        shardedMerkleRoot = root;
+        shardCount = count;
+        emit ShardedRootUpdated(root, count);
+    }
+
+    // Commit one shard's root once it is proven to be part of the sharded root at shardIndex;
+    // shards are committed (or re-committed) independently and from any account
+    function commitShardRoot(uint256 shardIndex, bytes32 shardRoot, bytes32[] calldata topProof) external {
+        require(shardIndex < shardCount, "Shard index out of range");
+        // Top-tree leaves pair each shard root with its index, so the proof only holds at that index
+        bytes32 shardLeaf = hashPair(shardRoot, bytes32(shardIndex));
+        require(processProof(topProof, shardLeaf) == shardedMerkleRoot, "Shard root is not part of the sharded root");
+        shardRoots[shardedMerkleRoot][shardIndex] = shardRoot;
+        emit ShardRootCommitted(shardedMerkleRoot, shardIndex, shardRoot);
+    }
+
+    // Function to verify one leaf's Merkle proof against a committed shard root
+    function verifyShardMerkleProof(
+        uint256 shardIndex,
+        bytes32[] calldata proof,    // Proof path inside the shard
+        bytes32 leaf
+    ) external view returns (bool) {
+        bytes32 shardRoot = shardRoots[shardedMerkleRoot][shardIndex];
+        return shardRoot != bytes32(0) && processProof(proof, leaf) == shardRoot;
+    }
+
+    // Function to verify many leaves of one shard against its committed root in a single call
+    function verifyShardMultiProof(
+        uint256 shardIndex,
+        bytes32[] calldata leaves,
+        uint256[] calldata indices,  // Positions inside the shard (strictly ascending)
+        bytes32[] calldata proof,
+        uint256 leafCount            // Number of leaves in the shard
+    ) external view returns (bool) {
+        bytes32 shardRoot = shardRoots[shardedMerkleRoot][shardIndex];
+        (bytes32 computedHash, bool complete) = multiProofRoot(leaves, indices, proof, leafCount);
+        return shardRoot != bytes32(0) && complete && computedHash == shardRoot;
+    }
+
     // Internal function to verify the Schnorr proof
     // It checks if the computed values on both sides of the equation are equal
     function verifySchnorrProof(
@@ -99,6 +158,91 @@ contract SchnorrBatchVerification {
         return computedHash == ipfsMerkleRoot && computedHash == vpMerkleRoot;
     }
 
+    // Function to verify many leaves against the stored Merkle roots in a single call
+    // Sibling nodes shared between the leaves' paths are sent only once in the proof
+    function verifyMerkleMultiProof(
+        bytes32[] calldata leaves,     // Hashed VCs (leaf nodes), ordered by their position in the tree
+        uint256[] calldata indices,    // Position of each leaf in the tree (strictly ascending)
+        bytes32[] calldata proof,      // Sibling nodes that cannot be computed from the leaves
+        uint256 leafCount              // Total number of leaves in the tree
+    ) external view returns (bool) {
+        (bytes32 computedHash, bool complete) = multiProofRoot(leaves, indices, proof, leafCount);
+
+        // The computed root must match both stored roots
+        return complete && computedHash == ipfsMerkleRoot && computedHash == vpMerkleRoot;
+    }
+
+    // Helper function that checks a multiproof's leaves and computes its root;
+    // complete is false unless every proof element was consumed
+    function multiProofRoot(
+        bytes32[] calldata leaves,
+        uint256[] calldata indices,
+        bytes32[] calldata proof,
+        uint256 leafCount
+    ) internal pure returns (bytes32 computedHash, bool complete) {
+        require(leaves.length > 0 && leaves.length == indices.length, "Invalid multiproof leaves");
+        for (uint256 i = 1; i < indices.length; i++) {
+            require(indices[i - 1] < indices[i], "Leaf indices must be ascending");
+        }
+        require(indices[indices.length - 1] < leafCount, "Leaf index out of range");
+
+        uint256 proofUsed;
+        (computedHash, proofUsed) = processMultiProof(leaves, indices, proof, leafCount);
+        complete = proofUsed == proof.length;
+    }
+
+    // Helper function that folds a single proof path from a leaf up to its root
+    function processProof(bytes32[] calldata proof, bytes32 leaf) internal pure returns (bytes32 computedHash) {
+        computedHash = leaf;
+        for (uint256 i = 0; i < proof.length; i++) {
+            computedHash = hashPair(computedHash, proof[i]);
+        }
+    }
+
+    // Helper function that folds the known nodes layer by layer up to the root
+    function processMultiProof(
+        bytes32[] memory nodes,        // Known nodes of the current layer (starts as the leaves)
+        uint256[] memory positions,    // Position of each known node in the current layer
+        bytes32[] calldata proof,      // Sibling nodes, in the order they are consumed
+        uint256 size                   // Number of nodes in the current layer
+    ) internal pure returns (bytes32, uint256) {
+        uint256 count = nodes.length;
+        uint256 proofPos = 0;
+
+        while (size > 1) {
+            uint256 written = 0;
+            for (uint256 i = 0; i < count; ) {
+                uint256 index = positions[i];
+                bytes32 node = nodes[i];
+                if (i + 1 < count && positions[i + 1] == (index ^ 1)) {
+                    // Both children are known: hash them together
+                    node = hashPair(node, nodes[i + 1]);
+                    i += 2;
+                } else {
+                    // Take the sibling from the proof; a node without a sibling is promoted unchanged
+                    if ((index ^ 1) < size) {
+                        require(proofPos < proof.length, "Multiproof too short");
+                        node = hashPair(node, proof[proofPos++]);
+                    }
+                    i += 1;
+                }
+                // Parents are written in place; the write position never passes the read position
+                positions[written] = index / 2;
+                nodes[written] = node;
+                written++;
+            }
+            count = written;
+            size = (size + 1) / 2;
+        }
+
+        return (nodes[0], proofPos);
+    }
+
+    // Helper function to hash two nodes in sorted order (same ordering as verifyMerkleProof)
+    function hashPair(bytes32 a, bytes32 b) internal pure returns (bytes32) {
+        return a <= b ? keccak256(abi.encodePacked(a, b)) : keccak256(abi.encodePacked(b, a));
+    }
+
     // Helper function for optimized modular exponentiation (efficiently computes base^exp % mod)
     function modExp(uint256 base, uint256 exp, uint256 mod) internal pure returns (uint256) {
         uint256 result = 1;  // Initialize result as 1
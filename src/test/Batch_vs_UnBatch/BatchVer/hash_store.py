@@ -0,0 +1,121 @@
+import json
+import mmap
+import os
+import threading
+
+RECORD_SIZE = 32  # One raw sha256 digest per student index
+EMPTY_RECORD = bytes(RECORD_SIZE)
+
+
+class HashStore:
+    """ Binary store of hashed VCs: record i of the data file holds the digest of student index i,
+    and a side table maps each index to its student DID. Lookups are slices of a memory map,
+    taken under the same lock refresh() holds while it swaps the map. """
+
+    def __init__(self, path='ipfs.bin', did_path='ipfs_dids.tsv'):
+        self.path = path
+        self.did_path = did_path
+        self.dids = {}  # index -> student DID
+        self._map = None
+        self._map_size = 0
+        self._did_size = 0
+        self._lock = threading.Lock()
+        for file_path in (path, did_path):
+            if not os.path.exists(file_path):
+                open(file_path, 'wb').close()
+        self.refresh()
+
+    def refresh(self):
+        """ Re-maps the data file and re-reads the DID table if another process has grown them """
+        size = os.path.getsize(self.path)
+        if size != self._map_size:
+            new_map = None
+            if size:
+                with open(self.path, 'rb') as f:
+                    new_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                size = len(new_map)
+            with self._lock:
+                # Readers hold the lock while slicing, so none is still using the old map when it closes
+                old_map, self._map, self._map_size = self._map, new_map, size
+            if old_map is not None:
+                old_map.close()
+
+        # Only the lines appended since the last refresh are read
+        if os.path.getsize(self.did_path) != self._did_size:
+            with self._lock, open(self.did_path, 'rb') as f:
+                f.seek(self._did_size)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # A writer is still appending this line
+                    index, student_did = line.decode().rstrip('\n').split('\t', 1)
+                    self.dids[int(index)] = student_did
+                    self._did_size += len(line)
+
+    def __len__(self):
+        return len(self.dids)
+
+    def get(self, index):
+        """ Returns the 32-byte digest stored for a student index, or None """
+        offset = index * RECORD_SIZE
+        with self._lock:
+            if index < 0 or offset + RECORD_SIZE > self._map_size:
+                return None
+            record = self._map[offset:offset + RECORD_SIZE]
+        return None if record == EMPTY_RECORD else record
+
+    def put_many(self, records):
+        """ Writes {index: (student_did, digest)} records in place; the file is never rewritten """
+        with open(self.path, 'r+b') as f:
+            for index, (_, digest) in records.items():
+                if len(digest) != RECORD_SIZE:
+                    raise ValueError(f"Digest for index {index} must be {RECORD_SIZE} bytes")
+                f.seek(int(index) * RECORD_SIZE)  # Seeking past the end leaves zero-filled gaps
+                f.write(digest)
+
+        # The DID table is append-only; a later line for the same index wins
+        with open(self.did_path, 'a') as f:
+            for index, (student_did, _) in records.items():
+                f.write(f"{int(index)}\t{student_did}\n")
+        self.refresh()
+
+    def put(self, index, student_did, digest):
+        self.put_many({index: (student_did, digest)})
+
+    def did_items(self):
+        """ (index, student_did) pairs in index order, copied under the lock refresh() appends with """
+        with self._lock:
+            return sorted(self.dids.items())
+
+    def items(self):
+        """ Yields (index, student_did, digest) in index order """
+        for index, student_did in self.did_items():
+            digest = self.get(index)
+            if digest is not None:
+                yield index, student_did, digest
+
+    def export_json(self, json_path='ipfs.json'):
+        """ Writes the store in the ipfs.json layout used by vp_gen.py and older tools """
+        ipfs_data = {
+            str(index): {"student_did": student_did, "hashed_vc": digest.hex()}
+            for index, student_did, digest in self.items()
+        }
+        with open(json_path, 'w') as file:
+            json.dump(ipfs_data, file, indent=4)
+
+    def import_json(self, json_path='ipfs.json'):
+        """ Loads an existing ipfs.json into the store """
+        with open(json_path, 'r') as file:
+            ipfs_data = json.load(file)
+        self.put_many({
+            int(index): (entry['student_did'], bytes.fromhex(entry['hashed_vc']))
+            for index, entry in ipfs_data.items()
+        })
+
+
+# Open the store next to ipfs.json, importing ipfs.json the first time
+def open_hash_store(path='ipfs.bin', did_path='ipfs_dids.tsv', json_path='ipfs.json'):
+    needs_import = not os.path.exists(path) or os.path.getsize(path) == 0
+    store = HashStore(path, did_path)
+    if needs_import and os.path.exists(json_path) and os.path.getsize(json_path) > 0:
+        store.import_json(json_path)
+    return store
@@ -1,6 +1,6 @@
 import json
 import hashlib
-import os  # To check if the file exists
+from hash_store import open_hash_store
 
 # Function to hash the Verifiable Credential (VC)
 def hash_verifiable_credential(vc):
@@ -8,25 +8,18 @@ def hash_verifiable_credential(vc):
     vc_string = json.dumps(vc, separators=(',', ':'))  # Ensure consistent string formatting
     return hashlib.sha256(vc_string.encode()).hexdigest()
 
-# Function to store the hashed VCs along with student DID in ipfs.json
+# Function to store the hashed VCs along with student DID in the binary hash store (ipfs.bin)
 def store_hashed_vcs(vcs):
-    # Check if the file exists or is empty, if not create an empty dictionary
-    if not os.path.exists('ipfs.json') or os.stat('ipfs.json').st_size == 0:
-        ipfs_data = {}
-    else:
-        # Load the existing ipfs.json file
-        with open('ipfs.json', 'r') as file:
-            ipfs_data = json.load(file)
+    # Records are written in place at their index, so existing entries are never rewritten
+    # (an existing ipfs.json is imported the first time the store is created)
+    hash_store = open_hash_store()
+    hash_store.put_many({
+        index: (vc_data['student_did'], bytes.fromhex(vc_data['hashed_vc']))
+        for index, vc_data in vcs.items()
+    })
 
-    # Add or update the hashed VCs and student DIDs under their respective indices
-    for index, vc_data in vcs.items():
-        ipfs_data[str(index)] = vc_data
-
-    # Save the updated data back to ipfs.json
-    with open('ipfs.json', 'w') as file:
-        json.dump(ipfs_data, file, indent=4)
-
-    print(f"{len(vcs)} Hashed VCs stored successfully in ipfs.json.")
+    print(f"{len(vcs)} Hashed VCs stored successfully in {hash_store.path}.")
+    return hash_store
 
 # Function to generate multiple VCs
 def generate_vcs(num_vcs):
@@ -75,8 +68,11 @@ def main():
     # Generate the VCs and their hashed values
     vcs = generate_vcs(num_vcs)
 
-    # Store the hashed VCs and DIDs in ipfs.json
-    store_hashed_vcs(vcs)
+    # Store the hashed VCs and DIDs in the binary hash store
+    hash_store = store_hashed_vcs(vcs)
+
+    # Export ipfs.json as well, since vp_gen.py reads the JSON layout
+    hash_store.export_json('ipfs.json')
 
 if __name__ == "__main__":
     main()
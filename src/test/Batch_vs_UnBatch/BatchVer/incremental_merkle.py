@@ -0,0 +1,165 @@
+import mmap
+import os
+import threading
+from merkle_tree import HASH_SIZE, hash_pair, to_leaf
+
+EMPTY_NODE = bytes(HASH_SIZE)  # Unused leaf slot (and every node above only unused slots)
+
+
+# Parent of two nodes: an empty side is skipped, so a lone child is promoted unchanged
+# and its proof simply leaves that level out (same rule as an odd node in MerkleTree)
+def _parent(left, right):
+    if left == EMPTY_NODE:
+        return right
+    if right == EMPTY_NODE:
+        return left
+    return hash_pair(left, right)
+
+
+class IncrementalMerkleTree:
+    """ Merkle tree persisted in a file, with leaf slot i holding the leaf of student index i.
+
+    Nodes are stored in heap order (node 1 is the root, node k has children 2k and 2k + 1)
+    for a power-of-two number of leaf slots, so changing a leaf only rehashes its path
+    to the root and the root and proofs are always available without a rebuild. """
+
+    def __init__(self, path, capacity=1):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as f:
+                f.truncate(2 * max(1, capacity) * HASH_SIZE)
+        self._open()
+
+        # Leaf slots in use, read once here and kept current by every update
+        self._occupied = {
+            index for index in range(self.capacity)
+            if self._node(self.capacity + index) != EMPTY_NODE
+        }
+
+    def _open(self):
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = len(self._map) // (2 * HASH_SIZE)
+
+    def _node(self, node):
+        offset = node * HASH_SIZE
+        return self._map[offset:offset + HASH_SIZE]
+
+    def _set_node(self, node, value):
+        offset = node * HASH_SIZE
+        self._map[offset:offset + HASH_SIZE] = value
+
+    def _grow(self, index):
+        """ Doubles the leaf slots until index fits; the old tree becomes the leftmost subtree """
+        capacity = self.capacity
+        while capacity <= index:
+            capacity *= 2
+        shift = capacity.bit_length() - self.capacity.bit_length()  # Levels added above the old root
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.truncate(2 * capacity * HASH_SIZE)
+            # Old level d (nodes 2^d .. 2^(d+1) - 1) moves to the start of new level d + shift
+            width = 1
+            while width <= self.capacity:
+                f.seek((width << shift) * HASH_SIZE)
+                f.write(self._map[width * HASH_SIZE:2 * width * HASH_SIZE])
+                width *= 2
+            # The new levels above the old root only have an empty right side, so they repeat the old root
+            old_root = self._node(1)
+            for level in range(shift):
+                f.seek((1 << level) * HASH_SIZE)
+                f.write(old_root)
+
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+
+    def _rehash(self, nodes):
+        """ Recomputes the ancestors of the given heap nodes, one level at a time """
+        parents = {node // 2 for node in nodes if node > 1}
+        while parents:
+            next_parents = set()
+            for node in parents:
+                value = _parent(self._node(2 * node), self._node(2 * node + 1))
+                if value != self._node(node):
+                    self._set_node(node, value)
+                    if node > 1:
+                        next_parents.add(node // 2)
+            parents = next_parents
+
+    def update_many(self, leaves):
+        """ Writes {index: leaf} (a leaf of None removes the slot) and returns the number of changed leaves """
+        with self._lock:
+            changes = {}
+            for index, leaf in leaves.items():
+                value = EMPTY_NODE if leaf is None else to_leaf(leaf)
+                if value == EMPTY_NODE and index not in self._occupied:
+                    continue
+                if index >= self.capacity:
+                    self._grow(index)
+                if self._node(self.capacity + index) != value:
+                    changes[index] = value
+
+            for index, value in changes.items():
+                self._set_node(self.capacity + index, value)
+                if value == EMPTY_NODE:
+                    self._occupied.discard(index)
+                else:
+                    self._occupied.add(index)
+            self._rehash([self.capacity + index for index in changes])
+            return len(changes)
+
+    def sync(self, leaves):
+        """ Makes the tree hold exactly {index: leaf}; only the leaves that differ are rehashed """
+        updates = dict.fromkeys(self._occupied.difference(leaves))  # Slots no longer in the batch
+        updates.update(leaves)
+        return self.update_many(updates)
+
+    def set(self, index, leaf):
+        return self.update_many({index: leaf})
+
+    def remove(self, index):
+        return self.update_many({index: None})
+
+    def __len__(self):
+        return len(self._occupied)
+
+    def __contains__(self, index):
+        return index in self._occupied
+
+    @property
+    def root(self):
+        # Root of an empty tree is undefined
+        with self._lock:
+            root = self._node(1)
+        return None if root == EMPTY_NODE else root
+
+    def leaf(self, index):
+        if index not in self._occupied:
+            raise IndexError(f"Leaf index {index} is not set")
+        with self._lock:
+            return self._node(self.capacity + index)
+
+    def proof(self, index):
+        """ Returns the sibling path for a leaf as a list of bytes32 values """
+        if index not in self._occupied:
+            raise IndexError(f"Leaf index {index} is not set")
+        proof = []
+        with self._lock:
+            node = self.capacity + index
+            while node > 1:
+                sibling = self._node(node ^ 1)
+                if sibling != EMPTY_NODE:  # An empty sibling means this node was promoted
+                    proof.append(sibling)
+                node //= 2
+        return proof
+
+    def flush(self):
+        with self._lock:
+            self._map.flush()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
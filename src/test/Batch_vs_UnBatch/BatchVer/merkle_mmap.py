@@ -0,0 +1,83 @@
+import mmap
+import struct
+from merkle_tree import HASH_SIZE, MerkleTree, hash_layer, to_leaf
+
+MAGIC = b'MRKLTREE'
+HEADER = struct.Struct('<8sQ')  # Magic, leaf count
+WINDOW_NODES = 1 << 16  # Nodes hashed per read while building (2 MiB of leaves), must be even
+
+
+# Number of nodes in every layer, leaves first, following MerkleTree's odd-node promotion
+def layer_sizes(leaf_count):
+    sizes = [leaf_count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+class MappedMerkleTree(MerkleTree):
+    """ MerkleTree read from a file through a memory map.
+
+    The file holds a header followed by every layer stored contiguously, leaves first, with
+    one 32-byte slot per node. Layers are views into the map, so a proof only touches the
+    page of one node per layer and the tree never has to fit in RAM. """
+
+    __slots__ = ('_file', '_map', '_view')
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, leaf_count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Merkle tree file")
+
+        self._view = memoryview(self._map)
+        layers = []
+        offset = HEADER.size
+        for size in layer_sizes(leaf_count):
+            layers.append(self._view[offset:offset + size * HASH_SIZE])
+            offset += size * HASH_SIZE
+        super().__init__(layers)
+
+    @classmethod
+    def build(cls, path, leaves, window=WINDOW_NODES):
+        """ Writes the tree for an iterable of leaves to path and maps it.
+
+        Leaves are streamed to the file and each layer is hashed from the one below it a
+        window at a time, so memory use stays bounded whatever the number of leaves. """
+        with open(path, 'w+b') as f:
+            f.write(HEADER.pack(MAGIC, 0))
+            leaf_count = 0
+            for leaf in leaves:
+                f.write(to_leaf(leaf))
+                leaf_count += 1
+
+            read_offset = HEADER.size
+            write_offset = read_offset + leaf_count * HASH_SIZE
+            for size in layer_sizes(leaf_count)[:-1]:
+                layer_end = read_offset + size * HASH_SIZE
+                while read_offset < layer_end:
+                    f.seek(read_offset)
+                    chunk = f.read(min(window * HASH_SIZE, layer_end - read_offset))
+                    read_offset += len(chunk)
+                    f.seek(write_offset)
+                    write_offset += f.write(hash_layer(chunk))
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, leaf_count))
+        return cls(path)
+
+    def close(self):
+        # Views into the map must be released before it can be closed
+        for layer in self.layers:
+            layer.release()
+        self.layers = []
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
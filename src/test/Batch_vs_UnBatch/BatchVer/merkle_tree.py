@@ -0,0 +1,332 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import zip_longest
+from multiprocessing import shared_memory
+from eth_hash.auto import keccak
+
+HASH_SIZE = 32  # Every node is a raw 32-byte digest (bytes32 on-chain)
+PARALLEL_THRESHOLD = 1 << 16  # Below this many leaves a process pool costs more than it saves
+CHUNKS_PER_WORKER = 4  # Subtrees handed to each worker, so a slow worker does not hold up the build
+
+# Process pool shared by every parallel build, started on first use so later builds skip the worker start-up.
+# Workers are spawned rather than forked, so they never inherit the app's connections and threads.
+_pool = None
+_pool_workers = 0
+_pool_users = {}  # Pool -> builds currently submitting to it
+_pool_lock = threading.Lock()
+
+
+# The module's process pool with at least `workers` processes, held for the duration of a build.
+# A larger request replaces the pool; the old one is shut down once the last build using it is done.
+@contextmanager
+def process_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None and _pool_users[_pool] == 0:
+                del _pool_users[_pool]
+                _pool.shutdown(wait=False)  # Idle, so nothing is still submitting to it
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+            _pool_users[_pool] = 0
+        pool = _pool
+        _pool_users[pool] += 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[pool] -= 1
+            retired = pool is not _pool and _pool_users[pool] == 0
+            if retired:
+                del _pool_users[pool]
+        if retired:
+            pool.shutdown(wait=False)
+
+
+# Hash a pair of nodes the same way SchnorrBatchVerification.verifyMerkleProof does:
+# keccak256 over the two nodes, smaller one first
+def hash_pair(left, right):
+    if left <= right:
+        return keccak(left + right)
+    return keccak(right + left)
+
+
+# Hash one contiguous layer into the next one
+def hash_layer(layer):
+    """ Reduces a bytearray of packed 32-byte nodes to its parent layer """
+    size = len(layer)
+    next_layer = bytearray()
+    pair_end = size - size % (2 * HASH_SIZE)
+
+    for i in range(0, pair_end, 2 * HASH_SIZE):
+        pair = layer[i:i + 2 * HASH_SIZE]
+        if pair[:HASH_SIZE] <= pair[HASH_SIZE:]:
+            next_layer += keccak(pair)
+        else:
+            next_layer += keccak(pair[HASH_SIZE:] + pair[:HASH_SIZE])
+
+    # Odd node at the end of the layer is promoted unchanged, so its proof simply skips this level
+    if pair_end < size:
+        next_layer += layer[pair_end:]
+
+    return next_layer
+
+
+# Convert a leaf (hex string from ipfs.json / token.json, or raw bytes) into 32 raw bytes
+def to_leaf(value):
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith('0x') else value)
+    if len(value) != HASH_SIZE:
+        raise ValueError(f"Merkle leaf must be {HASH_SIZE} bytes, got {len(value)}")
+    return bytes(value)
+
+
+class MerkleTree:
+    """ Merkle Tree whose layers are contiguous bytearrays of 32-byte digests """
+
+    __slots__ = ('layers',)
+
+    def __init__(self, layers):
+        self.layers = layers  # layers[0] holds the leaves, layers[-1] holds the root
+
+    @classmethod
+    def from_leaves(cls, leaves):
+        """ Builds the whole tree in a single bottom-up pass """
+        layer = bytearray()
+        for leaf in leaves:
+            layer += to_leaf(leaf)
+        return cls._hash_up([layer])
+
+    @classmethod
+    def _hash_up(cls, layers):
+        # Hash the last layer up to the root
+        layer = layers[-1]
+        while len(layer) > HASH_SIZE:
+            layer = hash_layer(layer)
+            layers.append(layer)
+        return cls(layers)
+
+    @classmethod
+    def build_parallel(cls, leaves, workers=None, threshold=PARALLEL_THRESHOLD):
+        """ Builds the same tree as from_leaves, hashing the lower layers in a process pool.
+
+        The leaves are split into aligned power-of-two chunks whose subtrees never share a pair,
+        each worker of the module's process pool hashes whole subtrees in shared memory, and the few
+        layers above the chunk roots are finished serially. Small inputs are built serially. """
+        layer = bytearray()
+        for leaf in leaves:
+            layer += to_leaf(leaf)
+        leaf_count = len(layer) // HASH_SIZE
+        workers = workers or os.cpu_count() or 1
+        if workers < 2 or leaf_count < max(threshold, 2):
+            return cls._hash_up([layer])
+
+        # Largest power-of-two chunk that still gives every worker a few chunks
+        levels = max(1, (leaf_count // (workers * CHUNKS_PER_WORKER)).bit_length() - 1)
+        chunk_size = 1 << levels
+
+        # Every layer the workers fill, laid out back to back in one shared block
+        sizes = [leaf_count]
+        for _ in range(levels):
+            sizes.append((sizes[-1] + 1) // 2)
+        offsets = [0]
+        for size in sizes:
+            offsets.append(offsets[-1] + size * HASH_SIZE)
+
+        shm = shared_memory.SharedMemory(create=True, size=offsets[-1])
+        try:
+            shm.buf[:len(layer)] = layer
+            with process_pool(workers) as pool:
+                jobs = [
+                    pool.submit(_hash_subtree, shm.name, offsets, sizes, start, chunk_size)
+                    for start in range(0, leaf_count, chunk_size)
+                ]
+                for job in jobs:
+                    job.result()  # Re-raise any worker failure
+            layers = [bytearray(shm.buf[offsets[i]:offsets[i + 1]]) for i in range(len(sizes))]
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # Finish the top of the tree serially from the chunk roots
+        return cls._hash_up(layers)
+
+    def __len__(self):
+        return len(self.layers[0]) // HASH_SIZE
+
+    @property
+    def root(self):
+        # Root of an empty tree is undefined
+        if not self.layers[-1]:
+            return None
+        return bytes(self.layers[-1][:HASH_SIZE])
+
+    def leaf(self, index):
+        offset = index * HASH_SIZE
+        return bytes(self.layers[0][offset:offset + HASH_SIZE])
+
+    def proof(self, index):
+        """ Returns the sibling path for a leaf as a list of bytes32 values """
+        if not 0 <= index < len(self):
+            raise IndexError(f"Leaf index {index} out of range")
+
+        proof = []
+        for layer in self.layers[:-1]:  # Skip the last layer (the root)
+            sibling = index ^ 1
+            if sibling * HASH_SIZE < len(layer):
+                offset = sibling * HASH_SIZE
+                proof.append(bytes(layer[offset:offset + HASH_SIZE]))
+            index //= 2
+        return proof
+
+
+# Worker for build_parallel: hash the subtree of chunk_size leaves starting at start, writing
+# each of its layers into the shared block (pairs never cross aligned chunk boundaries)
+def _hash_subtree(shm_name, offsets, sizes, start, chunk_size):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        for level in range(len(sizes) - 1):
+            begin = offsets[level] + start * HASH_SIZE
+            end = offsets[level] + min(start + chunk_size, sizes[level]) * HASH_SIZE
+            parents = hash_layer(bytes(shm.buf[begin:end]))
+            start //= 2
+            chunk_size //= 2
+            offset = offsets[level + 1] + start * HASH_SIZE
+            shm.buf[offset:offset + len(parents)] = parents
+    finally:
+        shm.close()
+
+
+class StreamingRoot:
+    """ Computes a MerkleTree root one leaf at a time, keeping at most log2(n) + 1 pending nodes """
+
+    __slots__ = ('_stack', 'count')
+
+    def __init__(self):
+        self._stack = []  # (level, node) of complete subtrees, levels strictly decreasing
+        self.count = 0
+
+    def add(self, leaf):
+        level, node = 0, to_leaf(leaf)
+        # Two complete subtrees of the same height are siblings in MerkleTree's layout
+        while self._stack and self._stack[-1][0] == level:
+            node = hash_pair(self._stack.pop()[1], node)
+            level += 1
+        self._stack.append((level, node))
+        self.count += 1
+
+    @property
+    def root(self):
+        # Root of an empty tree is undefined
+        if not self._stack:
+            return None
+        # The smaller trailing subtrees are promoted until they meet their left neighbour
+        node = self._stack[-1][1]
+        for _, left in reversed(self._stack[:-1]):
+            node = hash_pair(left, node)
+        return node
+
+
+# Root of a stream of leaves without holding the tree
+def streaming_root(leaves):
+    stream = StreamingRoot()
+    for leaf in leaves:
+        stream.add(leaf)
+    return stream.root
+
+
+# Walk two leaf streams together in a single pass: returns (None, root) when they match,
+# or (index, None) for the first position where they differ (including one stream ending early)
+def compare_streams(left_leaves, right_leaves):
+    stream = StreamingRoot()
+    missing = object()
+    for index, (left, right) in enumerate(zip_longest(left_leaves, right_leaves, fillvalue=missing)):
+        if left is missing or right is missing or to_leaf(left) != to_leaf(right):
+            return index, None
+        stream.add(left)
+    return None, stream.root
+
+
+# Recompute a root from a leaf and its proof (off-chain mirror of verifyMerkleProof)
+def verify_proof(proof, leaf, root):
+    computed_hash = to_leaf(leaf)
+    for proof_element in proof:
+        computed_hash = hash_pair(computed_hash, proof_element)
+    return computed_hash == root
+
+
+# Walk the tree layer by layer the same way verifyMerkleMultiProof does and yield
+# (layer, sibling_index) for every sibling the verifier cannot compute itself
+def _multiproof_walk(layer_sizes, indices):
+    indices = sorted(set(indices))
+    for layer, size in enumerate(layer_sizes[:-1]):
+        parents = []
+        i = 0
+        while i < len(indices):
+            index = indices[i]
+            sibling = index ^ 1
+            if i + 1 < len(indices) and indices[i + 1] == sibling:
+                i += 2  # Both children are known, nothing to send
+            else:
+                if sibling < size:
+                    yield layer, sibling
+                i += 1
+            parents.append(index // 2)
+        indices = parents
+
+
+class MerkleMultiProof:
+    """ One compact proof for many leaves: shared sibling nodes are sent only once """
+
+    __slots__ = ('leaf_count', 'indices', 'leaves', 'proof')
+
+    def __init__(self, leaf_count, indices, leaves, proof):
+        self.leaf_count = leaf_count
+        self.indices = indices  # Leaf positions, ascending
+        self.leaves = leaves    # bytes32 leaves in the same order as indices
+        self.proof = proof      # Sibling nodes in the order the verifier consumes them
+
+
+def get_multiproof(tree, indices):
+    """ Builds a multiproof for the given leaf indices of a MerkleTree """
+    indices = sorted(set(indices))
+    if not indices:
+        raise ValueError("Multiproof needs at least one leaf")
+    if indices[0] < 0 or indices[-1] >= len(tree):
+        raise IndexError("Leaf index out of range")
+
+    layer_sizes = [len(layer) // HASH_SIZE for layer in tree.layers]
+    proof = []
+    for layer, sibling in _multiproof_walk(layer_sizes, indices):
+        offset = sibling * HASH_SIZE
+        proof.append(bytes(tree.layers[layer][offset:offset + HASH_SIZE]))
+
+    return MerkleMultiProof(len(tree), indices, [tree.leaf(i) for i in indices], proof)
+
+
+# Recompute the root from a multiproof (off-chain mirror of verifyMerkleMultiProof)
+def verify_multiproof(multiproof, root):
+    size = multiproof.leaf_count
+    nodes = list(zip(multiproof.indices, (to_leaf(leaf) for leaf in multiproof.leaves)))
+    proof = iter(multiproof.proof)
+
+    while size > 1:
+        parents = []
+        i = 0
+        while i < len(nodes):
+            index, node = nodes[i]
+            if i + 1 < len(nodes) and nodes[i + 1][0] == index ^ 1:
+                node = hash_pair(node, nodes[i + 1][1])
+                i += 2
+            else:
+                if index ^ 1 < size:
+                    node = hash_pair(node, next(proof))
+                i += 1
+            parents.append((index // 2, node))
+        nodes = parents
+        size = (size + 1) // 2
+
+    return nodes[0][1] == root and next(proof, None) is None
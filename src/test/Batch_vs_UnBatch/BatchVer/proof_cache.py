@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+from merkle_tree import HASH_SIZE
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # Budget for cached leaves and proofs
+ENTRY_OVERHEAD = 200  # Rough per-entry cost of the key, tuple and list objects
+
+
+class CachedProof:
+    """ A student's leaf and Merkle proof under one committed root """
+    __slots__ = ('leaf', 'proof')
+
+    def __init__(self, leaf, proof):
+        self.leaf = leaf
+        self.proof = proof
+
+
+class ProofCache:
+    """ LRU cache of Merkle proofs keyed by (merkle_root, student_did), bounded by a byte budget """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.latest_root = None  # Root of the most recently cached tree
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cost(student_did, proof):
+        return ENTRY_OVERHEAD + len(student_did) + HASH_SIZE * (len(proof) + 1)
+
+    def put_many(self, merkle_root, entries):
+        """ Caches {student_did: CachedProof} for a tree and makes its root the latest one """
+        with self._lock:
+            for student_did, entry in entries.items():
+                key = (merkle_root, student_did)
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.size_bytes -= self._cost(student_did, previous.proof)
+                self._entries[key] = entry
+                self.size_bytes += self._cost(student_did, entry.proof)
+            self.latest_root = merkle_root
+            self._evict()
+
+    def _evict(self):
+        # Drop the least recently used proofs until the cache is back under budget
+        while self.size_bytes > self.max_bytes and self._entries:
+            (_, student_did), entry = self._entries.popitem(last=False)
+            self.size_bytes -= self._cost(student_did, entry.proof)
+
+    def get(self, student_did, merkle_root=None):
+        """ Returns the CachedProof for a student under a root (the latest one by default), or None """
+        with self._lock:
+            key = (merkle_root or self.latest_root, student_did)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "latest_root": self.latest_root.hex() if self.latest_root else None
+            }
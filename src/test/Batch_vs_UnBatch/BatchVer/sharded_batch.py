@@ -0,0 +1,175 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from merkle_tree import HASH_SIZE, PARALLEL_THRESHOLD, MerkleTree, get_multiproof, hash_pair, process_pool, to_leaf
+
+SHARD_SIZE = 1024  # Leaves per shard; bounds the calldata and gas of every shard transaction
+SHARD_RETRIES = 2  # Extra attempts for a shard whose commit or check fails
+SHARD_GAS = 20000000
+
+
+# Leaf of the top tree for a shard: its root paired with its index, so a shard root only proves
+# membership at its own position (commitShardRoot recomputes this before folding the top proof)
+def shard_leaf(shard_index, shard_root):
+    return hash_pair(shard_root, shard_index.to_bytes(HASH_SIZE, 'big'))
+
+
+# Worker for ShardedMerkleTree.build: one shard's layers from its packed leaves
+def _build_shard(packed_leaves):
+    return MerkleTree.from_leaves(
+        packed_leaves[i:i + HASH_SIZE] for i in range(0, len(packed_leaves), HASH_SIZE)
+    ).layers
+
+
+class ShardedMerkleTree:
+    """ A batch split into fixed-size shard trees plus a top tree over the shard roots.
+
+    The top tree's leaves are shard_leaf(i, root_i). A leaf's full proof is its shard proof, its
+    shard's index as a bytes32 node, then the shard's proof in the top tree, so it still verifies
+    against the root of roots with verifyMerkleProof's folding. """
+
+    __slots__ = ('shard_size', 'shards', 'top')
+
+    def __init__(self, shards, shard_size):
+        self.shard_size = shard_size
+        self.shards = shards
+        self.top = MerkleTree.from_leaves(shard_leaf(i, shard.root) for i, shard in enumerate(shards))
+
+    @classmethod
+    def build(cls, leaves, shard_size=SHARD_SIZE, workers=None):
+        """ Builds every shard tree, in a process pool when the batch is large """
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        packed = [bytearray()]
+        for leaf in leaves:
+            if len(packed[-1]) == shard_size * HASH_SIZE:
+                packed.append(bytearray())
+            packed[-1] += to_leaf(leaf)
+        if not packed[-1]:
+            packed.pop()
+
+        if len(packed) > 1 and len(packed) * shard_size >= PARALLEL_THRESHOLD and workers != 1:
+            with process_pool(workers or os.cpu_count() or 1) as pool:
+                shards = [MerkleTree(layers) for layers in pool.map(_build_shard, packed)]
+        else:
+            shards = [MerkleTree(_build_shard(chunk)) for chunk in packed]
+        return cls(shards, shard_size)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def root(self):
+        return self.top.root
+
+    def shard_range(self, shard_index):
+        # Batch positions covered by a shard
+        start = shard_index * self.shard_size
+        return range(start, start + len(self.shards[shard_index]))
+
+    def leaf(self, index):
+        return self.shards[index // self.shard_size].leaf(index % self.shard_size)
+
+    def proof(self, index):
+        """ Returns the proof of a leaf against the root of roots """
+        shard_index = index // self.shard_size
+        return (
+            self.shards[shard_index].proof(index % self.shard_size)
+            + [shard_index.to_bytes(HASH_SIZE, 'big')]
+            + self.top.proof(shard_index)
+        )
+
+
+class ShardResult:
+    """ Outcome of committing and checking one shard """
+    __slots__ = ('shard_index', 'sender', 'valid', 'gas_used', 'attempts', 'error')
+
+    def __init__(self, shard_index, sender):
+        self.shard_index = shard_index
+        self.sender = sender
+        self.valid = []  # Batch positions whose leaves verified
+        self.gas_used = 0
+        self.attempts = 0
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "shard_index": self.shard_index,
+            "sender": self.sender,
+            "verified_leaves": len(self.valid),
+            "gas_used": self.gas_used,
+            "attempts": self.attempts,
+            "error": self.error
+        }
+
+
+def _run_shard(w3, contract, tree, shard_index, sender, verify_mode, estimate_gas, retries, wait):
+    result = ShardResult(shard_index, sender)
+    shard = tree.shards[shard_index]
+    tx_params = {'from': sender}
+
+    for attempt in range(1 + retries):
+        result.attempts = attempt + 1
+        try:
+            # Commit the shard root; the contract checks it against the root of roots
+            tx_hash = contract.functions.commitShardRoot(
+                shard_index, shard.root, tree.top.proof(shard_index)
+            ).transact({'from': sender, 'gas': SHARD_GAS})
+            receipt = wait(tx_hash)
+            result.gas_used += receipt['gasUsed']
+            if receipt['status'] != 1:
+                raise RuntimeError("commitShardRoot reverted")
+
+            # Check the whole shard with one multiproof
+            multiproof = get_multiproof(shard, range(len(shard)))
+            verify_call = contract.functions.verifyShardMultiProof(
+                shard_index, multiproof.leaves, multiproof.indices, multiproof.proof, multiproof.leaf_count
+            )
+            shard_ok = verify_call.call(tx_params)
+            if verify_mode == 'transact':
+                receipt = wait(verify_call.transact({'from': sender, 'gas': SHARD_GAS}))
+                result.gas_used += receipt['gasUsed']
+            elif estimate_gas:
+                result.gas_used += verify_call.estimate_gas(tx_params)
+
+            positions = tree.shard_range(shard_index)
+            if shard_ok:
+                result.valid = list(positions)
+            else:
+                # Find the bad leaves with read-only single proofs inside the shard
+                result.valid = [
+                    position for local, position in enumerate(positions)
+                    if contract.functions.verifyShardMerkleProof(
+                        shard_index, shard.proof(local), shard.leaf(local)
+                    ).call(tx_params)
+                ]
+            result.error = None
+            return result
+        except Exception as e:
+            result.error = str(e)
+    return result
+
+
+def verify_shards(w3, contract, tree, senders, verify_mode='call', estimate_gas=True, retries=SHARD_RETRIES,
+                  tracker=None):
+    """ Commits the root of roots, then commits and checks every shard on its own.
+    Each sender account works through its own share of the shards, so shards are in flight
+    from several accounts at once without nonce clashes. Returns (gas_used, [ShardResult]). """
+    tx_hash = contract.functions.setShardedRoot(tree.root, len(tree.shards)).transact({
+        'from': senders[0], 'gas': SHARD_GAS
+    })
+    wait = tracker.wait if tracker is not None else w3.eth.wait_for_transaction_receipt
+    receipt = wait(tx_hash)
+    if receipt['status'] != 1:
+        raise RuntimeError("setShardedRoot reverted")
+
+    def run_sender(sender_slot):
+        return [
+            _run_shard(w3, contract, tree, shard_index, senders[sender_slot], verify_mode, estimate_gas, retries, wait)
+            for shard_index in range(sender_slot, len(tree.shards), len(senders))
+        ]
+
+    sender_slots = range(min(len(senders), len(tree.shards)))
+    with ThreadPoolExecutor(max_workers=len(sender_slots)) as pool:
+        results = [result for batch in pool.map(run_sender, sender_slots) for result in batch]
+    results.sort(key=lambda result: result.shard_index)
+    return receipt['gasUsed'], results
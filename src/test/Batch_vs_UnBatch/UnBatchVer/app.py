@@ -4,6 +4,16 @@ import json
 import random
 import hashlib
 import time
+from async_verifier import MAX_CONCURRENCY, run_jobs
+from bulk_register import register_dids_bulk
+from data_store import DataStore
+from hash_store import open_hash_store
+from payload_stream import chunked, is_streamed_payload, iter_students
+from did_cache import DidIndexCache
+from receipt_tracker import ReceiptTracker
+from rpc_batch import BatchReader, ReadError
+from schnorr_batch import SchnorrBatchVerifier, SchnorrStatement, batch_digest
+from sender_pool import SenderPool
 
 app = Flask(__name__)
 
@@ -18,11 +28,35 @@ with open('e-transcript/build/contracts/SchnorrBatchVerification.json') as f:
 
 contract = w3.eth.contract(address=contract_address, abi=contract_abi)
 
+# Parsed token.json / payload, reloaded only when a file changes
+data_store = DataStore()
+
+# Hashed VCs from IPFS as fixed-width binary records, looked up by index through a memory map
+hash_store = open_hash_store()
+
+# DID -> index cache, seeded from DidIndexed events on startup and kept current in the background
+did_cache = DidIndexCache(w3, contract)
+did_cache.start()
+
+# Receipts of every transaction the app sends, resolved from new blocks by one background thread
+receipt_tracker = ReceiptTracker(w3)
+receipt_tracker.start()
+
+# Accounts engine=pool spreads verification transactions over, starting at the verifying account
+SENDER_ACCOUNTS = 4
+sender_pool = SenderPool(w3, w3.eth.accounts[5:5 + SENDER_ACCOUNTS], tracker=receipt_tracker)
+
 # Static variables for Schnorr proof
 G = 2  # Generator (example)
 P = 23  # Prime modulus (example)
 proof_verified = False  # To store the state of Schnorr proof verification
 
+# Checks engine=batch's Schnorr proofs off-chain with random linear combinations
+schnorr_verifier = SchnorrBatchVerifier(G, P)
+
+# Number of contract reads sent per JSON-RPC batch request
+READ_CHUNK_SIZE = 200
+
 @app.route('/', methods=['GET'])
 def batch_ver_page():
     # Render the HTML form page for batch verification
@@ -36,26 +70,43 @@ def store_did_page():
 @app.route('/store_did_to_index', methods=['POST'])
 def store_did_to_index():
     try:
-        # Load the ipfs.json file to get DID and index information
-        with open('ipfs.json', 'r') as f:
-            ipfs_data = json.load(f)
-
-        # Loop through each student's DID and index
-        for index, student_data in ipfs_data.items():
-            student_did = student_data['student_did']
-            student_index = int(index)  # Convert index from string to integer
-
-            # Call the smart contract function to store DID and index
-            tx_hash = contract.functions.storeDidToIndex(student_did, student_index).transact({
-                'from': w3.eth.accounts[2], 'gas': 20000000
-            })
-            # Wait for the transaction to be mined
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            print(f"Stored DID: {student_did} with index: {student_index} on the blockchain")
+        # Get DID and index information from the hash store
+        hash_store.refresh()
+
+        # "bulk" registers the DIDs in gas-bounded chunks with storeDidsToIndices,
+        # "single" sends one storeDidToIndex transaction per student
+        register_mode = request.values.get('register_mode', 'bulk')
+        entries = [(student_did, index) for index, student_did in hash_store.did_items()]
+
+        if register_mode == 'bulk':
+            result = register_dids_bulk(w3, contract, entries, w3.eth.accounts[2], tracker=receipt_tracker)
+        else:
+            start_time = time.time()
+            total_gas_used = 0
+            for student_did, student_index in entries:
+                # Call the smart contract function to store DID and index
+                tx_hash = contract.functions.storeDidToIndex(student_did, student_index).transact({
+                    'from': w3.eth.accounts[2], 'gas': 20000000
+                })
+                # Wait for the transaction to be mined
+                receipt = receipt_tracker.wait(tx_hash)
+                total_gas_used += receipt['gasUsed']
+                print(f"Stored DID: {student_did} with index: {student_index} on the blockchain")
+            result = {
+                "registered": len(entries),
+                "transactions": len(entries),
+                "failed_transactions": [],
+                "total_gas_used": total_gas_used,
+                "wall_time": time.time() - start_time
+            }
+
+        # Pick up the new DidIndexed events right away instead of waiting for the next poll
+        did_cache.sync()
 
         return jsonify({
             "status": "success",
-            "message": "All DIDs and indices have been stored on the blockchain"
+            "message": f"{result['registered']} of {len(entries)} DIDs and indices have been stored on the blockchain",
+            **result
         })
 
     except Exception as e:
@@ -64,68 +115,249 @@ def store_did_to_index():
             "message": str(e)
         })
 
+@app.route('/did_cache/stats', methods=['GET'])
+def did_cache_stats():
+    # Report the cache size and hit/miss counters
+    return jsonify(did_cache.stats())
+
+@app.route('/did_cache/resync', methods=['POST'])
+def did_cache_resync():
+    try:
+        # Rebuild the DID -> index cache from every DidIndexed event on the chain
+        applied_events = did_cache.resync()
+        return jsonify({"status": "success", "applied_events": applied_events, **did_cache.stats()})
+    except Exception as e:
+        return jsonify({"status": "failed", "message": str(e)})
+
+# Run a view function with eth_call and report its gas with estimate_gas instead of mining it
+def call_view(contract_function, estimate_gas=True):
+    tx_params = {'from': w3.eth.accounts[5]}
+    result = contract_function.call(tx_params)
+    gas_used = contract_function.estimate_gas(tx_params) if estimate_gas else 0
+    return result, gas_used
+
+# Verify one prepared student: mine the Schnorr proof, then check the hashed VC
+def verify_student(prepared, verify_mode, estimate_gas):
+    # Gas used for Schnorr proof verification
+    tx_hash_schnorr = contract.functions.verifySchnorrProof(
+        *prepared['schnorr_args']
+    ).transact({'from': w3.eth.accounts[5], 'gas': 20000000})
+
+    receipt_schnorr = receipt_tracker.wait(tx_hash_schnorr)
+    schnorr_gas_used = receipt_schnorr['gasUsed']
+
+    # Perform VC verification (a view function, so it only needs a mined transaction in transact mode)
+    verify_vc_call = contract.functions.verifyHashedVC(*prepared['vc_args'])
+    if verify_mode == 'transact':
+        tx_hash_vc = verify_vc_call.transact({'from': w3.eth.accounts[5], 'gas': 20000000})
+        receipt_vc = receipt_tracker.wait(tx_hash_vc)
+        vc_valid = receipt_vc['status'] == 1  # Mined receipts cannot carry the returned boolean
+        vc_gas_used = receipt_vc['gasUsed']
+    else:
+        vc_valid, vc_gas_used = call_view(verify_vc_call, estimate_gas)
+    return vc_valid, schnorr_gas_used, vc_gas_used
+
+# Verify every prepared student concurrently on the asyncio engine
+def verify_students_async(prepared_students, verify_mode, estimate_gas, max_concurrency):
+    async def verify_one(engine, prepared):
+        _, schnorr_gas_used = await engine.transact('verifySchnorrProof', *prepared['schnorr_args'])
+        if verify_mode == 'transact':
+            vc_valid, vc_gas_used = await engine.transact('verifyHashedVC', *prepared['vc_args'])
+        else:
+            vc_valid, vc_gas_used = await engine.call('verifyHashedVC', *prepared['vc_args'], estimate_gas=estimate_gas)
+        return vc_valid, schnorr_gas_used, vc_gas_used
+
+    return run_jobs(
+        w3.provider.endpoint_uri, contract_address, contract_abi,
+        verify_one, prepared_students,
+        sender_index=5, gas=20000000, max_concurrency=max_concurrency
+    )
+
+# Verify every prepared student on a thread pool, spreading the transactions over the sender pool's accounts
+def verify_students_pooled(prepared_students, verify_mode, estimate_gas, senders):
+    def verify_one(prepared):
+        receipt_schnorr = sender_pool.transact(
+            contract.functions.verifySchnorrProof(*prepared['schnorr_args']), gas=20000000, senders=senders
+        )
+        verify_vc_call = contract.functions.verifyHashedVC(*prepared['vc_args'])
+        if verify_mode == 'transact':
+            receipt_vc = sender_pool.transact(verify_vc_call, gas=20000000, senders=senders)
+            return receipt_vc['status'] == 1, receipt_schnorr['gasUsed'], receipt_vc['gasUsed']
+        vc_valid, vc_gas_used = call_view(verify_vc_call, estimate_gas)
+        return vc_valid, receipt_schnorr['gasUsed'], vc_gas_used
+
+    return sender_pool.map(verify_one, prepared_students, senders=senders)
+
+# Check every prepared student's Schnorr proof off-chain in one batch, post one attestation marking
+# the valid DIDs as verified, then check the hashed VCs. Returns (results, attestation gas used).
+def verify_students_batched(prepared_students, verify_mode, estimate_gas):
+    statements = []
+    for prepared in prepared_students:
+        R, s, g, p, c, hashed_email, _ = prepared['schnorr_args']
+        # Public value the contract derives from the hashed email in calculateRHS
+        y = pow(g, int.from_bytes(Web3.keccak(text=hashed_email), 'big'), p)
+        statements.append(SchnorrStatement(R, s, c, y))
+    if not statements:
+        return [], 0
+    schnorr_valid = schnorr_verifier.verify(statements)
+
+    verified_dids = [prepared['student_did'] for prepared, valid in zip(prepared_students, schnorr_valid) if valid]
+    # Only the contract's attester (its deployer) may post batch results
+    attester = contract.functions.attester().call()
+    tx_hash = contract.functions.attestSchnorrBatch(
+        verified_dids, batch_digest(statements, schnorr_valid), len(statements)
+    ).transact({'from': attester, 'gas': 20000000})
+    receipt = receipt_tracker.wait(tx_hash)
+    if receipt['status'] != 1:
+        raise RuntimeError("attestSchnorrBatch reverted")
+
+    results = []
+    for prepared, valid in zip(prepared_students, schnorr_valid):
+        if not valid:
+            results.append(RuntimeError("Schnorr proof failed"))
+            continue
+        verify_vc_call = contract.functions.verifyHashedVC(*prepared['vc_args'])
+        if verify_mode == 'transact':
+            receipt_vc = receipt_tracker.wait(verify_vc_call.transact({'from': w3.eth.accounts[5], 'gas': 20000000}))
+            results.append((receipt_vc['status'] == 1, 0, receipt_vc['gasUsed']))
+        else:
+            vc_valid, vc_gas_used = call_view(verify_vc_call, estimate_gas)
+            results.append((vc_valid, 0, vc_gas_used))
+    return results, receipt['gasUsed']
+
+@app.route('/receipt_tracker/stats', methods=['GET'])
+def receipt_tracker_stats():
+    # Report pending receipts and how many blocks and RPC batches resolved them
+    return jsonify(receipt_tracker.stats())
+
+@app.route('/sender_pool/stats', methods=['GET'])
+def sender_pool_stats():
+    # Report each pool account's next nonce and in-flight transactions
+    return jsonify(sender_pool.stats())
+
 @app.route('/batch_verify_json', methods=['POST'])
 def batch_verify_from_json():
     try:
-        # Load the necessary data
-        with open('batch_verification_payload.json', 'r') as f:
-            students_data = json.load(f)['students']
+        # Load the necessary data (parsed once and re-parsed only when a file changes on disk)
+        if is_streamed_payload(request):
+            # Students streamed in the request body (NDJSON or a JSON array) are parsed as they arrive
+            students_data = iter_students(request.stream, request.mimetype)
+        else:
+            students_data = data_store.payload.get()
+        tokens = data_store.tokens.get()
+        hash_store.refresh()  # Pick up records appended by hash_vc.py since the last request
 
-        with open('token.json', 'r') as f:
-            token_data = json.load(f)
-
-        with open('ipfs.json', 'r') as f:
-            ipfs_data = json.load(f)
+        # "call" checks the hashed VC with eth_call, "transact" mines the check as well
+        # (verifySchnorrProof changes state, so it is always mined)
+        verify_mode = request.values.get('verify_mode', 'call')
+        # In call mode, gas is reported from estimate_gas; set estimate_gas=0 to skip it
+        estimate_gas = request.values.get('estimate_gas', '1') != '0'
+        # "sync" verifies one student after another, "async" runs them concurrently on AsyncWeb3,
+        # "pool" runs them on threads with the transactions spread over several sender accounts,
+        # "batch" checks each chunk's Schnorr proofs off-chain together and attests them in one transaction
+        engine = request.values.get('engine', 'sync')
+        max_concurrency = int(request.values.get('max_concurrency', MAX_CONCURRENCY))
+        senders = int(request.values.get('senders', SENDER_ACCOUNTS))
 
         valid_students = []
         start_time = time.time()
         total_gas_used_schnorr = 0
         total_gas_used_vc = 0
 
-        for student in students_data:
-            student_did = student['student_did']
-            student_index = contract.functions.getIndexByDid(student_did).call()
-            ipfs_vc = ipfs_data[str(student_index)]['hashed_vc']
-
-            # Perform Schnorr proof verification
-            hashed_email = hashlib.sha256(student['email'].encode()).hexdigest()
-            r = random.randint(1, 22)
-            R = pow(2, r, 23)
-            challenge = contract.functions.getChallenge(R).call()
-            hashed_secret = int(hashlib.sha256(student['email'].encode()).hexdigest(), 16) % 23
-            s = (r + challenge * hashed_secret) % 22
-
-            # Gas used for Schnorr proof verification
-            tx_hash_schnorr = contract.functions.verifySchnorrProof(
-                R, s, 2, 23, challenge, hashed_email, student_did
-            ).transact({'from': w3.eth.accounts[5], 'gas': 20000000})
-            
-            receipt_schnorr = w3.eth.wait_for_transaction_receipt(tx_hash_schnorr)
-            schnorr_gas_used = receipt_schnorr['gasUsed']
-            total_gas_used_schnorr += schnorr_gas_used
-
-            # Perform VC verification
-            tx_hash_vc = contract.functions.verifyHashedVC(
-                token_data[str(student_index)]['verifiablePresentation']['verifiableCredential'][0]['hash'],
-                student_did,
-                ipfs_vc
-            ).transact({'from': w3.eth.accounts[5], 'gas': 20000000})
-
-            receipt_vc = w3.eth.wait_for_transaction_receipt(tx_hash_vc)
-            vc_gas_used = receipt_vc['gasUsed']
-            total_gas_used_vc += vc_gas_used
-
-            if receipt_vc['status'] == 1:
-                valid_students.append({
+        invalid_students = []
+
+        # Work through the students chunk by chunk as they are read, so on-chain work starts
+        # before the last student of a streamed payload has arrived
+        read_chunk_size = int(request.values.get('read_chunk_size', READ_CHUNK_SIZE))
+        for students_chunk in chunked(students_data, read_chunk_size):
+            # Pick the chunk's Schnorr nonces up front so the challenges can be read in one batch
+            nonces = [random.randint(1, 22) for _ in students_chunk]
+
+            # Look up every index in the local cache (misses go out as batched reads),
+            # then read the challenges with batched JSON-RPC reads (one round trip per chunk)
+            student_indices = did_cache.lookup_many(
+                [student.student_did for student in students_chunk],
+                chunk_size=read_chunk_size
+            )
+            reader = BatchReader(w3, chunk_size=read_chunk_size)
+            for r in nonces:
+                reader.add(contract, 'getChallenge', (pow(2, r, 23),))
+            challenges = reader.execute()
+
+            # Build each student's Schnorr proof and VC check arguments
+            prepared_students = []
+            for i, student in enumerate(students_chunk):
+                student_did = student.student_did
+                student_index, challenge = student_indices[i], challenges[i]
+                if isinstance(student_index, ReadError) or isinstance(challenge, ReadError):
+                    # A failed read only fails this student
+                    invalid_students.append({
+                        "student_did": student_did,
+                        "status": "Contract read failed"
+                    })
+                    continue
+                ipfs_hashed_vc = hash_store.get(student_index)  # O(1) slice of the memory map
+                presentation = tokens.by_index.get(student_index)
+                if ipfs_hashed_vc is None or presentation is None:
+                    invalid_students.append({
+                        "student_did": student_did,
+                        "status": "No hashed VC stored for this student"
+                    })
+                    continue
+
+                # Perform Schnorr proof verification
+                hashed_email = hashlib.sha256(student.email.encode()).hexdigest()
+                r = nonces[i]
+                R = pow(2, r, 23)
+                hashed_secret = int(hashlib.sha256(student.email.encode()).hexdigest(), 16) % 23
+                s = (r + challenge * hashed_secret) % 22
+
+                prepared_students.append({
                     "student_did": student_did,
-                    "status": "verified and VC valid"
+                    "schnorr_args": (R, s, 2, 23, challenge, hashed_email, student_did),
+                    "vc_args": (
+                        presentation.vp_hashed_vc.hex(),
+                        student_did,
+                        ipfs_hashed_vc.hex()
+                    )
                 })
 
+            if engine == 'async':
+                # Run the chunk's Schnorr transactions and VC checks concurrently
+                results = verify_students_async(prepared_students, verify_mode, estimate_gas, max_concurrency)
+            elif engine == 'pool':
+                # Run the chunk's students on threads, several accounts sending at once
+                results = verify_students_pooled(prepared_students, verify_mode, estimate_gas, senders)
+            elif engine == 'batch':
+                # Check the chunk's Schnorr proofs off-chain and post a single attestation for them
+                results, attestation_gas_used = verify_students_batched(prepared_students, verify_mode, estimate_gas)
+                total_gas_used_schnorr += attestation_gas_used
+            else:
+                results = (verify_student(prepared, verify_mode, estimate_gas) for prepared in prepared_students)
+
+            for prepared, result in zip(prepared_students, results):
+                if isinstance(result, Exception):
+                    invalid_students.append({
+                        "student_did": prepared['student_did'],
+                        "status": f"verification failed: {result}"
+                    })
+                    continue
+                vc_valid, schnorr_gas_used, vc_gas_used = result
+                total_gas_used_schnorr += schnorr_gas_used
+                total_gas_used_vc += vc_gas_used
+
+                if vc_valid:
+                    valid_students.append({
+                        "student_did": prepared['student_did'],
+                        "status": "verified and VC valid"
+                    })
+
         verification_time = time.time() - start_time
 
         return jsonify({
             "status": "success",
             "valid_students": valid_students,
+            "invalid_students": invalid_students,
             "verification_time": verification_time,
             "total_gas_used_schnorr": total_gas_used_schnorr,
             "total_gas_used_vc": total_gas_used_vc
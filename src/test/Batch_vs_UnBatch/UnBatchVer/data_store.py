@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+
+
+# Compact records holding only the fields verification needs
+
+class PresentationRecord:
+    """ One token.json entry: the hashed VC carried inside the student's VP """
+    __slots__ = ('index', 'student_did', 'vp_hashed_vc')
+
+    def __init__(self, index, student_did, vp_hashed_vc):
+        self.index = index
+        self.student_did = student_did
+        self.vp_hashed_vc = vp_hashed_vc  # 32 raw bytes
+
+
+class AclRecord:
+    """ One acl.json entry """
+    __slots__ = ('student_did', 'employer_hashed_email', 'expiration', 'is_valid')
+
+    def __init__(self, student_did, employer_hashed_email, expiration, is_valid):
+        self.student_did = student_did
+        self.employer_hashed_email = employer_hashed_email  # hex string, as written by acl_create.py
+        self.expiration = expiration
+        self.is_valid = is_valid
+
+
+class PayloadStudent:
+    """ One student of batch_verification_payload.json """
+    __slots__ = ('student_did', 'email')
+
+    def __init__(self, student_did, email):
+        self.student_did = student_did
+        self.email = email
+
+
+class RecordTable:
+    """ Records addressable both by student index and by DID """
+    __slots__ = ('by_index', 'by_did')
+
+    def __init__(self, records):
+        self.by_index = {}
+        self.by_did = {}
+        for record in records:
+            if getattr(record, 'index', None) is not None:
+                self.by_index[record.index] = record
+            self.by_did[record.student_did] = record
+
+    def __len__(self):
+        return len(self.by_did)
+
+
+# Hex string from the JSON files -> 32 raw bytes
+def _digest(hex_value):
+    return bytes.fromhex(hex_value[2:] if hex_value.startswith('0x') else hex_value)
+
+
+def load_presentations(data):
+    return RecordTable(
+        PresentationRecord(
+            int(index),
+            entry['student_did'],
+            _digest(entry['verifiablePresentation']['verifiableCredential'][0]['hash'])
+        )
+        for index, entry in data.items()
+    )
+
+
+def load_acl(data):
+    return [
+        AclRecord(entry['student_did'], entry['employer_hashed_email'], entry['expiration'], entry['isValid'])
+        for entry in data['students']
+    ]
+
+
+def load_payload(data):
+    return [PayloadStudent(student['student_did'], student['email']) for student in data['students']]
+
+
+class CachedFile:
+    """ Parses a JSON file once and re-parses it only when its mtime or size changes """
+
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self._signature = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._signature:
+                with open(self.path, 'r') as f:
+                    self._value = self.loader(json.load(f))
+                self._signature = signature
+            return self._value
+
+
+class DataStore:
+    """ Shared, memory-resident view of the JSON files the verification endpoints read """
+
+    def __init__(self, base_dir='.'):
+        self.tokens = CachedFile(os.path.join(base_dir, 'token.json'), load_presentations)
+        self.acl = CachedFile(os.path.join(base_dir, 'acl.json'), load_acl)
+        self.payload = CachedFile(os.path.join(base_dir, 'batch_verification_payload.json'), load_payload)
@@ -0,0 +1,96 @@
+import logging
+import threading
+from rpc_batch import ReadError, batch_call
+
+# Seconds between polls for new DidIndexed events
+POLL_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class DidIndexCache:
+    """ In-process DID -> index map, seeded from DidIndexed events and kept current by following new ones """
+
+    def __init__(self, w3, contract, poll_interval=POLL_INTERVAL):
+        self.w3 = w3
+        self.contract = contract
+        self.poll_interval = poll_interval
+        self.did_to_index = {}
+        self.next_block = 0  # First block whose events have not been applied yet
+        self.hits = 0
+        self.misses = 0
+        self.sync_failures = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ Seeds the cache from every past event, then follows new events in a background thread """
+        self.sync()
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _follow(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                self.sync_failures += 1
+                self.last_error = str(e)
+                logger.warning("DID cache sync failed: %s", e)
+
+    def sync(self):
+        """ Applies DidIndexed events from the last synced block up to the latest block """
+        with self._lock:
+            latest_block = self.w3.eth.block_number
+            if latest_block < self.next_block:
+                return 0
+            events = self.contract.events.DidIndexed.get_logs(from_block=self.next_block, to_block=latest_block)
+            # Logs come back in chain order, so a later registration of the same DID wins
+            for event in events:
+                self.did_to_index[event['args']['studentDid']] = event['args']['index']
+            self.next_block = latest_block + 1
+            return len(events)
+
+    def resync(self):
+        """ Drops everything and rebuilds the cache from the first block """
+        with self._lock:
+            self.did_to_index.clear()
+            self.next_block = 0
+        return self.sync()
+
+    def lookup_many(self, dids, chunk_size=200):
+        """ Returns the index of every DID in order. Misses are read from the contract in one
+        JSON-RPC batch and cached; a failed read is returned as a ReadError in its slot. """
+        with self._lock:
+            indices = [self.did_to_index.get(did) for did in dids]
+            missing = [i for i, index in enumerate(indices) if index is None]
+            self.hits += len(dids) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            results = batch_call(
+                self.w3, self.contract, 'getIndexByDid',
+                [(dids[i],) for i in missing], chunk_size=chunk_size
+            )
+            with self._lock:
+                for i, result in zip(missing, results):
+                    indices[i] = result
+                    # Index 0 means "never registered", so it is not worth caching
+                    if not isinstance(result, ReadError) and result != 0:
+                        self.did_to_index[dids[i]] = result
+        return indices
+
+    def stats(self):
+        return {
+            "entries": len(self.did_to_index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "synced_to_block": self.next_block - 1,
+            "sync_failures": self.sync_failures,
+            "last_error": self.last_error
+        }
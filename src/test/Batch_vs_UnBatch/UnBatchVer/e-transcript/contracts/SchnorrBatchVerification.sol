@@ -4,11 +4,27 @@ pragma solidity ^0.8.0;
 contract SchnorrBatchVerification {
     mapping(string => bool) public schnorrProofVerified;
     mapping(string => uint256) public didToIndex;
+    address public attester; // Account allowed to post Schnorr proofs verified off-chain
 
     event DebugValues(uint256 lhs, uint256 rhs, uint256 R, uint256 s);
+    event DidIndexed(string studentDid, uint256 index);
+    event SchnorrBatchAttested(bytes32 batchDigest, uint256 proofCount, uint256 validCount);
+
+    constructor() {
+        attester = msg.sender;
+    }
 
     function storeDidToIndex(string memory studentDid, uint256 index) public {
         didToIndex[studentDid] = index;
+        emit DidIndexed(studentDid, index);
+    }
+
+    function storeDidsToIndices(string[] memory studentDids, uint256[] memory indices) public {
+        require(studentDids.length == indices.length, "DID and index counts differ");
+        for (uint256 i = 0; i < studentDids.length; i++) {
+            didToIndex[studentDids[i]] = indices[i];
+            emit DidIndexed(studentDids[i], indices[i]);
+        }
     }
 
     function getIndexByDid(string memory studentDid) public view returns (uint256) {
@@ -45,6 +61,16 @@ contract SchnorrBatchVerification {
         return true;
     }
 
+    // Records a batch of Schnorr proofs verified off-chain in one transaction instead of one
+    // verifySchnorrProof per proof; every listed DID counts as verified
+    function attestSchnorrBatch(string[] memory verifiedDids, bytes32 batchDigest, uint256 proofCount) public {
+        require(msg.sender == attester, "Only the attester can post batch results");
+        for (uint256 i = 0; i < verifiedDids.length; i++) {
+            schnorrProofVerified[verifiedDids[i]] = true;
+        }
+        emit SchnorrBatchAttested(batchDigest, proofCount, verifiedDids.length);
+    }
+
     function verifyHashedVC(
         string memory hashedVCFromVP, 
         string memory studentDid, 
@@ -0,0 +1,116 @@
+import codecs
+import json
+from itertools import islice
+from data_store import PayloadStudent
+
+READ_SIZE = 64 * 1024  # Bytes read from the request body at a time
+STREAM_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json')
+
+_decoder = json.JSONDecoder()
+
+
+def _student(entry):
+    return PayloadStudent(entry['student_did'], entry['email'])
+
+
+# Yield students from an NDJSON body (one JSON object per line)
+def iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield _student(json.loads(line))
+
+
+# Yield students from a JSON array, or from the "students" key of an object, parsing one element at a time
+def iter_json_array(stream, read_size=READ_SIZE):
+    buffer = ''
+    pos = 0
+    exhausted = False
+    text_decoder = codecs.getincrementaldecoder('utf-8')()  # Handles characters split across chunks
+
+    def fill():
+        nonlocal buffer, pos, exhausted
+        chunk = stream.read(read_size)
+        if not chunk:
+            exhausted = True
+            return
+        # Drop what has already been parsed so memory stays bounded by one chunk plus one element
+        buffer = buffer[pos:] + (text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        pos = 0
+
+    # Next character after any of `skip`, reading more of the body as needed (None at the end of it)
+    def peek(skip=' \t\r\n'):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in skip:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            fill()
+            if exhausted:
+                return None
+
+    # Parse one JSON value starting at pos
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or exhausted:
+                    pos = end
+                    return value
+                # A number ending at the buffer's end may continue in the next chunk
+            except json.JSONDecodeError:
+                # The value is cut off at the end of the buffer; read more and retry
+                if exhausted:
+                    raise
+            fill()
+
+    if peek() == '{':
+        # Walk the object's keys, skipping every value until "students"
+        pos += 1
+        while True:
+            if peek(' \t\r\n,') in (None, '}'):
+                raise ValueError("Payload does not contain a students array")
+            key = decode()
+            if peek() != ':':
+                raise ValueError("Payload object is malformed")
+            pos += 1
+            peek()
+            if key == 'students':
+                break
+            decode()
+
+    if peek() != '[':
+        raise ValueError("Payload does not contain a students array")
+    pos += 1
+
+    while True:
+        char = peek(' \t\r\n,')  # Skip whitespace and separators between elements
+        if char is None:
+            raise ValueError("Students array is not terminated")
+        if char == ']':
+            return
+        yield _student(decode())
+
+
+def iter_students(stream, content_type):
+    """ Parses a streamed batch payload incrementally and yields PayloadStudent records as they arrive """
+    if content_type.startswith(('application/x-ndjson', 'application/jsonl')):
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+# Is this request body a streamed payload (rather than an HTML form post)?
+def is_streamed_payload(request):
+    return (request.mimetype or '') in STREAM_CONTENT_TYPES
+
+
+# Split an iterator into lists of at most size items without reading ahead
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
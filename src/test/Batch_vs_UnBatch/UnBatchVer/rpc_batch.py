@@ -0,0 +1,76 @@
+import itertools
+import requests
+from hexbytes import HexBytes
+
+
+class ReadError(Exception):
+    """ A single read inside a JSON-RPC batch failed; the other reads are unaffected """
+
+
+class BatchReader:
+    """ Collects contract reads and sends them as JSON-RPC batch requests (one HTTP round trip per chunk) """
+
+    def __init__(self, w3, chunk_size=200, timeout=500):
+        self.w3 = w3
+        self.endpoint_uri = w3.provider.endpoint_uri
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._ids = itertools.count(1)
+        self._pending = []  # (request, output types) in the order the reads were added
+
+    def add(self, contract, fn_name, args=(), block='latest'):
+        """ Queues contract.functions[fn_name](*args).call() and returns its position in the results """
+        request = {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": "eth_call",
+            "params": [{
+                "to": contract.address,
+                "data": HexBytes(contract.encode_abi(fn_name, args=list(args))).to_0x_hex()
+            }, block]
+        }
+        output_types = [output['type'] for output in contract.get_function_by_name(fn_name).abi['outputs']]
+        self._pending.append((request, output_types))
+        return len(self._pending) - 1
+
+    def execute(self):
+        """ Sends every queued read and returns the decoded results in the order they were added.
+        A failed read is returned as a ReadError in its slot instead of raising. """
+        pending, self._pending = self._pending, []
+        results = []
+
+        for start in range(0, len(pending), self.chunk_size):
+            chunk = pending[start:start + self.chunk_size]
+            response = self.session.post(
+                self.endpoint_uri,
+                json=[request for request, _ in chunk],
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+
+            # Batch responses may come back in any order, so match them up by id
+            responses = {item.get('id'): item for item in response.json()}
+            for request, output_types in chunk:
+                results.append(self._decode(responses.get(request['id']), output_types))
+
+        return results
+
+    def _decode(self, response, output_types):
+        if response is None:
+            return ReadError("No response for this read")
+        if 'error' in response:
+            return ReadError(response['error'].get('message', str(response['error'])))
+        try:
+            values = self.w3.codec.decode(output_types, HexBytes(response['result']))
+        except Exception as e:
+            return ReadError(f"Could not decode result: {e}")
+        return values[0] if len(values) == 1 else values
+
+
+# Run the same read for many argument tuples and return the results in order
+def batch_call(w3, contract, fn_name, args_list, chunk_size=200):
+    reader = BatchReader(w3, chunk_size=chunk_size)
+    for args in args_list:
+        reader.add(contract, fn_name, args)
+    return reader.execute()
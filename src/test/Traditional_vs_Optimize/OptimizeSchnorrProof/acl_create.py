@@ -1,5 +1,6 @@
 import json
 import hashlib
+from revocation_bitmap import RevocationBitmap
 
 student_did_li = []
 
@@ -14,6 +15,7 @@ def generate_acl(num_entries):
         student_did = f"did:university:student{i+1}"  # DID format with incrementing student numbers
 
         acl_entry = {
+            "index": i,  # Stable bit in revocation.bin; kept with the entry so reordering the file moves nothing
             "student_did": student_did,
             "employer_hashed_email": hashed_email,  # Same hashed email for all entries
             "expiration": 1687581600 + i * 1000,  # Example expiration times (incremented)
@@ -27,7 +29,12 @@ def generate_acl(num_entries):
     with open('acl.json', 'w') as acl_file:
         json.dump({"students": acl_list}, acl_file, indent=4)
 
-    print(f"{num_entries} ACL entries successfully created and stored in acl.json.")
+    # One revocation bit per entry, set for the entries written as invalid
+    revocations = RevocationBitmap.create('revocation.bin', num_entries)
+    revocations.revoke_many(entry["index"] for entry in acl_list if not entry["isValid"])
+    revocations.close()
+
+    print(f"{num_entries} ACL entries successfully created and stored in acl.json (revocations in revocation.bin).")
 
 # Function to create a batch verification payload
 def create_batch_verification_payload(num_entries):
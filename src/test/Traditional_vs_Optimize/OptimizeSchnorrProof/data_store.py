@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from revocation_bitmap import RevocationBitmap
+
+
+# Compact records holding only the fields verification needs
+
+class AclRecord:
+    """ One acl.json entry; index is the entry's stored "index" field and its bit in revocation.bin """
+    __slots__ = ('index', 'student_did', 'employer_hashed_email', 'expiration', 'is_valid')
+
+    def __init__(self, index, student_did, employer_hashed_email, expiration, is_valid):
+        self.index = index
+        self.student_did = student_did
+        self.employer_hashed_email = employer_hashed_email  # hex string, as written by acl_create.py
+        self.expiration = expiration
+        self.is_valid = is_valid
+
+
+class PayloadStudent:
+    """ One student of batch_verification_payload.json """
+    __slots__ = ('student_did', 'email')
+
+    def __init__(self, student_did, email):
+        self.student_did = student_did
+        self.email = email
+
+
+class AclStore:
+    """ acl.json entries keyed by DID, plus an index ordered by expiration for pruning in bulk """
+
+    def __init__(self, records):
+        self.by_did = {}
+        for record in records:
+            self.by_did[record.student_did] = record
+        # (expiration, DID) in expiration order; pairs whose entry was replaced are skipped when pruning
+        self._expirations = sorted((record.expiration, record.student_did) for record in self.by_did.values())
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.by_did)
+
+    def get(self, student_did):
+        return self.by_did.get(student_did)
+
+    def revoke(self, student_did):
+        """ Marks an entry invalid; returns False when the DID has no entry """
+        with self._lock:
+            return self._revoke(student_did)
+
+    def _revoke(self, student_did):
+        record = self.by_did.get(student_did)
+        if record is None:
+            return False
+        record.is_valid = False
+        return True
+
+    def revoke_many(self, student_dids):
+        with self._lock:
+            return sum(self._revoke(student_did) for student_did in student_dids)
+
+    def prune_expired(self, now=None):
+        """ Drops every entry that expired before now and returns how many were dropped """
+        now = time.time() if now is None else now
+        with self._lock:
+            cut = bisect_left(self._expirations, (now,))
+            pruned = 0
+            for expiration, student_did in self._expirations[:cut]:
+                record = self.by_did.get(student_did)
+                if record is not None and record.expiration == expiration:
+                    del self.by_did[student_did]
+                    pruned += 1
+            del self._expirations[:cut]
+            return pruned
+
+
+# Files written before entries carried an "index" field fall back to the entry's position
+def load_acl(data):
+    return AclStore(
+        AclRecord(entry.get('index', position), entry['student_did'], entry['employer_hashed_email'],
+                  entry['expiration'], entry['isValid'])
+        for position, entry in enumerate(data['students'])
+    )
+
+
+def load_payload(data):
+    return [PayloadStudent(student['student_did'], student['email']) for student in data['students']]
+
+
+class CachedFile:
+    """ Parses a JSON file once and re-parses it only when its mtime or size changes """
+
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self._signature = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._signature:
+                with open(self.path, 'r') as f:
+                    self._value = self.loader(json.load(f))
+                self._signature = signature
+            return self._value
+
+
+class DataStore:
+    """ Shared, memory-resident view of acl.json, the payload and revocation.bin """
+
+    def __init__(self, base_dir='.'):
+        self.acl = CachedFile(os.path.join(base_dir, 'acl.json'), self._load_acl)
+        self.payload = CachedFile(os.path.join(base_dir, 'batch_verification_payload.json'), load_payload)
+        # One revocation bit per acl.json entry; revocations are written here instead of into acl.json
+        self.revocations = RevocationBitmap(os.path.join(base_dir, 'revocation.bin'))
+        # Prunes made through the app, re-applied whenever acl.json is reloaded
+        self.acl_pruned_before = None
+
+    def _load_acl(self, data):
+        acl = load_acl(data)
+        if self.acl_pruned_before is not None:
+            acl.prune_expired(self.acl_pruned_before)
+        return acl
+
+    def revoke(self, student_dids):
+        """ Revokes the DIDs' entries in revocation.bin and returns how many were newly revoked """
+        acl = self.acl.get()
+        records = [acl.get(student_did) for student_did in student_dids]
+        acl.revoke_many(student_dids)
+        return self.revocations.revoke_many(record.index for record in records if record is not None)
+
+    def revoked_among(self, acl_entries):
+        """ Returns the indices of the given ACL entries that are revoked in revocation.bin """
+        return self.revocations.revoked_among(entry.index for entry in acl_entries if entry is not None)
+
+    def prune_expired(self, now=None):
+        now = time.time() if now is None else now
+        acl = self.acl.get()
+        self.acl_pruned_before = max(now, self.acl_pruned_before or now)
+        return acl.prune_expired(now)
@@ -7,16 +7,54 @@ contract SchnorrSingleVerification {
         uint256 R;
         uint256 s;
         uint256 c;
+        uint256 employerHashedEmail; // Key of the employer's precomputed value
     }
 
-    uint256 public precomputedGHashedEmail; // Stores g^hashed_email mod p for reuse
+    // g^(hashed_email mod p) mod p for every precomputed employer, keyed by the employer's hashed email
+    mapping(uint256 => uint256) public precomputedGHashedEmails;
     uint256 constant G = 2; // Hardcoded generator constant
     uint256 constant P = 23; // Hardcoded prime modulus constant
 
-    // Sets precomputed value for g^hashed_email mod p once, if it hasn't been set already
-    function setPrecomputedGHashedEmail(uint256 hashedEmail) public {
-        if (precomputedGHashedEmail == 0) {
-            precomputedGHashedEmail = modExp(G, hashedEmail, P);
+    // Revocation bitmap mirrored from revocation.bin: bit (i % 256) of word (i / 256) is set when student index i is revoked.
+    // It is a public record for other readers (isRevoked); the proof checks below do not consult it, since the
+    // app drops revoked entries using revocation.bin before it builds the proofs.
+    mapping(uint256 => uint256) public revocationWords;
+    address public issuer; // Only the deploying account may change revocations or attest batches
+
+    event SchnorrBatchAttested(bytes32 batchDigest, uint256 proofCount, uint256 validCount);
+
+    constructor() {
+        issuer = msg.sender;
+    }
+
+    // Overwrite whole bitmap words with the app's current copy
+    function setRevocationWords(uint256[] calldata wordIndices, uint256[] calldata words) public {
+        require(msg.sender == issuer, "Only the issuer can update revocations");
+        require(wordIndices.length == words.length, "Word indices and words must have the same length");
+        for (uint256 i = 0; i < wordIndices.length; i++) {
+            revocationWords[wordIndices[i]] = words[i];
+        }
+    }
+
+    // Records the outcome of a batch of proofs verified off-chain, in one transaction instead of one per proof
+    function attestSchnorrBatch(bytes32 batchDigest, uint256 proofCount, uint256 validCount) public {
+        require(msg.sender == issuer, "Only the issuer can attest batches");
+        require(validCount <= proofCount, "More valid proofs than proofs");
+        emit SchnorrBatchAttested(batchDigest, proofCount, validCount);
+    }
+
+    // One storage read answers the revocation state of 256 consecutive student indices
+    function isRevoked(uint256 index) public view returns (bool) {
+        return ((revocationWords[index >> 8] >> (index & 255)) & 1) == 1;
+    }
+
+    // Precomputes g^hashed_email mod p for many employers at once; employers already stored are skipped.
+    // The exponent is reduced mod p, as the prover reduces its secret.
+    function setPrecomputedGHashedEmails(uint256[] calldata hashedEmails) public {
+        for (uint256 i = 0; i < hashedEmails.length; i++) {
+            if (precomputedGHashedEmails[hashedEmails[i]] == 0) {
+                precomputedGHashedEmails[hashedEmails[i]] = modExp(G, hashedEmails[i] % P, P);
+            }
         }
     }
 
@@ -25,10 +63,39 @@ contract SchnorrSingleVerification {
         return uint256(keccak256(abi.encodePacked(R))) % P;
     }
 
-    // Optimized verification using precomputed value
+    // Optimized verification using the employer's precomputed value
     function verifySchnorrProof(SchnorrProof memory proofData) public view returns (bool) {
-        uint256 lhs = modExp(G, proofData.s, P); // Compute g^s mod p
-        uint256 rhs = mulmod(proofData.R, modExp(precomputedGHashedEmail, proofData.c, P), P); // Compute R * (precomputedGHashedEmail)^c mod p
+        uint256 precomputed = precomputedGHashedEmails[proofData.employerHashedEmail];
+        return checkProof(proofData.R, proofData.s, proofData.c, precomputed);
+    }
+
+    // Verify many proofs in one call; bit (i % 256) of word (i / 256) is set when proofs[i] is valid.
+    // The precomputed value is only loaded from storage when the employer changes from the previous proof.
+    function verifySchnorrProofs(SchnorrProof[] calldata proofs) public view returns (uint256[] memory) {
+        uint256[] memory bitmap = new uint256[]((proofs.length + 255) / 256);
+        uint256 lastEmployer;
+        uint256 precomputed;
+
+        for (uint256 i = 0; i < proofs.length; i++) {
+            SchnorrProof calldata proofData = proofs[i];
+            if (i == 0 || proofData.employerHashedEmail != lastEmployer) {
+                lastEmployer = proofData.employerHashedEmail;
+                precomputed = precomputedGHashedEmails[lastEmployer];
+            }
+            if (checkProof(proofData.R, proofData.s, proofData.c, precomputed)) {
+                bitmap[i >> 8] |= uint256(1) << (i & 255);
+            }
+        }
+        return bitmap;
+    }
+
+    // Check g^s == R * (precomputed)^c mod p
+    function checkProof(uint256 R, uint256 s, uint256 c, uint256 precomputed) internal pure returns (bool) {
+        if (precomputed == 0) {
+            return false; // Employer not precomputed yet (g^x mod p is never 0)
+        }
+        uint256 lhs = modExp(G, s, P); // Compute g^s mod p
+        uint256 rhs = mulmod(R, modExp(precomputed, c, P), P); // Compute R * (precomputed)^c mod p
 
         // Check if left side equals the right side
         return lhs == rhs;
@@ -0,0 +1,26 @@
+CALL_GAS_BUDGET = 8000000  # Gas one batched call may use; well under Ganache's block gas limit
+PROBE_SIZE = 16  # Items in the first chunk, whose gas estimate sizes the chunks after it
+
+
+# Expand a uint256[] result bitmap into one bool per item
+def decode_bitmap(words, count):
+    return [bool(words[i >> 8] >> (i & 255) & 1) for i in range(count)]
+
+
+# Splits items into chunks whose call stays under gas_budget and yields (chunk, contract function, gas estimate).
+# The first chunk is small; its estimate_gas gives the gas per item, which sizes every later chunk.
+def gas_bounded_chunks(build_call, items, sender, gas_budget=CALL_GAS_BUDGET, probe_size=PROBE_SIZE):
+    items = list(items)
+    start = 0
+    chunk_size = probe_size
+    while start < len(items):
+        chunk = items[start:start + chunk_size]
+        contract_function = build_call(chunk)
+        gas = contract_function.estimate_gas({'from': sender})
+        if gas > gas_budget and len(chunk) > 1:
+            chunk_size = max(1, len(chunk) * gas_budget // gas)  # Too big: shrink and estimate again
+            continue
+        yield chunk, contract_function, gas
+        start += len(chunk)
+        # The estimate includes the fixed per-call cost, so this slightly undersizes the next chunk
+        chunk_size = max(1, gas_budget * len(chunk) // gas)
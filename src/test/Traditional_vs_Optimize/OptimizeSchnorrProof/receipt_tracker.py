@@ -0,0 +1,194 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import requests
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+
+POLL_INTERVAL = 0.1  # Seconds between block filter polls while receipts are pending
+SWEEP_INTERVAL = 5.0  # Seconds before a pending receipt is also fetched directly, in case its block was missed
+RECEIPT_TIMEOUT = 120
+RECENT_TRANSACTIONS = 10000  # Mined hashes remembered in case they are tracked after their block was seen
+
+logger = logging.getLogger(__name__)
+
+# Receipt fields returned as hex quantities that the apps read as ints
+_QUANTITY_FIELDS = ('status', 'gasUsed', 'cumulativeGasUsed', 'blockNumber', 'transactionIndex', 'effectiveGasPrice', 'type')
+
+
+def _format_receipt(raw):
+    receipt = dict(raw)
+    for field in _QUANTITY_FIELDS:
+        if isinstance(receipt.get(field), str):
+            receipt[field] = int(receipt[field], 16)
+    for field in ('transactionHash', 'blockHash'):
+        if receipt.get(field):
+            receipt[field] = HexBytes(receipt[field])
+    return AttributeDict(receipt)
+
+
+def _key(tx_hash):
+    return HexBytes(tx_hash).to_0x_hex()
+
+
+class ReceiptTracker:
+    """ Resolves many pending transaction receipts from new blocks instead of polling each hash.
+
+    A background thread follows a 'latest' block filter. For every new block it matches the
+    block's transaction hashes against the pending ones and fetches all of that block's
+    receipts in one JSON-RPC batch, so RPC traffic grows with blocks, not with transactions.
+    Hashes tracked since the last poll are also fetched directly in that batch, in case their
+    block was processed before they were tracked. """
+
+    def __init__(self, w3, poll_interval=POLL_INTERVAL, timeout=RECEIPT_TIMEOUT):
+        self.w3 = w3
+        self.endpoint_uri = w3.provider.endpoint_uri
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._ids = itertools.count(1)
+        self._pending = {}  # tx hash -> (Future, time tracked)
+        self._recent = OrderedDict()  # Mined tx hashes not tracked yet
+        self._ready = set()  # Tracked hashes already known to be mined
+        self._fresh = set()  # Tracked since the last poll and not seen in a block yet
+        self._wakeup = threading.Condition()
+        self._filter = None
+        self._thread = None
+        self.blocks_seen = 0
+        self.rpc_batches = 0
+        self.poll_failures = 0
+        self.last_error = None
+
+    def start(self):
+        self._filter = self.w3.eth.filter('latest')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def track(self, tx_hash):
+        """ Returns a Future that resolves to the transaction's receipt """
+        key = _key(tx_hash)
+        future = Future()
+        with self._wakeup:
+            if key in self._pending:
+                return self._pending[key][0]
+            self._pending[key] = (future, time.monotonic())
+            if self._recent.pop(key, None) is not None:
+                self._ready.add(key)  # Its block went by before it was tracked
+            else:
+                self._fresh.add(key)  # Checked directly on the next poll, not only at the sweep
+            self._wakeup.notify()
+        return future
+
+    def wait(self, tx_hash, timeout=None):
+        """ Blocks until the transaction is mined, like wait_for_transaction_receipt """
+        try:
+            return self.track(tx_hash).result(timeout or self.timeout)
+        except FutureTimeout:
+            self._forget(_key(tx_hash))
+            raise TimeExhausted(f"Transaction {_key(tx_hash)} is not in the chain after {timeout or self.timeout} seconds")
+
+    def wait_all(self, tx_hashes, timeout=None):
+        """ Tracks every hash at once and returns the receipts in the same order """
+        futures = [self.track(tx_hash) for tx_hash in tx_hashes]
+        deadline = time.monotonic() + (timeout or self.timeout)
+        receipts = []
+        for tx_hash, future in zip(tx_hashes, futures):
+            try:
+                receipts.append(future.result(max(0, deadline - time.monotonic())))
+            except FutureTimeout:
+                self._forget(_key(tx_hash))
+                raise TimeExhausted(f"Transaction {_key(tx_hash)} is not in the chain after {timeout or self.timeout} seconds")
+        return receipts
+
+    def _forget(self, key):
+        with self._wakeup:
+            self._pending.pop(key, None)
+            self._ready.discard(key)
+            self._fresh.discard(key)
+
+    def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            with self._wakeup:
+                while not self._pending:
+                    self._wakeup.wait()
+            try:
+                self._poll_blocks()
+                if time.monotonic() - last_sweep >= SWEEP_INTERVAL:
+                    self._sweep()
+                    last_sweep = time.monotonic()
+            except Exception as e:
+                # The node may have dropped the filter; make a new one and fetch everything pending directly
+                self.poll_failures += 1
+                self.last_error = str(e)
+                logger.warning("Receipt tracker poll failed, recreating block filter: %s", e)
+                try:
+                    self._filter = self.w3.eth.filter('latest')
+                    self._sweep(stale_after=0)
+                except Exception:
+                    pass
+            time.sleep(self.poll_interval)
+
+    def _poll_blocks(self):
+        mined = []
+        for block_hash in self._filter.get_new_entries():
+            block = self.w3.eth.get_block(block_hash)
+            self.blocks_seen += 1
+            with self._wakeup:
+                for tx_hash in block['transactions']:
+                    key = _key(tx_hash)
+                    if key in self._pending:
+                        mined.append(key)
+                    else:
+                        self._recent[key] = True
+                        if len(self._recent) > RECENT_TRANSACTIONS:
+                            self._recent.popitem(last=False)
+        with self._wakeup:
+            mined.extend(self._ready)
+            mined.extend(self._fresh)  # Unresolved ones stay pending for the blocks and the sweep
+            self._ready.clear()
+            self._fresh.clear()
+        self._resolve(set(mined))
+
+    def _sweep(self, stale_after=SWEEP_INTERVAL):
+        # Fetch receipts that have been pending for a while directly, in one batch
+        now = time.monotonic()
+        with self._wakeup:
+            stale = [key for key, (_, tracked_at) in self._pending.items() if now - tracked_at >= stale_after]
+        self._resolve(stale)
+
+    def _resolve(self, keys):
+        if not keys:
+            return
+        requests_by_id = {}
+        for key in keys:
+            requests_by_id[next(self._ids)] = key
+        response = self.session.post(self.endpoint_uri, json=[
+            {"jsonrpc": "2.0", "id": request_id, "method": "eth_getTransactionReceipt", "params": [key]}
+            for request_id, key in requests_by_id.items()
+        ], timeout=self.timeout)
+        response.raise_for_status()
+        self.rpc_batches += 1
+
+        for item in response.json():
+            key = requests_by_id.get(item.get('id'))
+            if key is None or not item.get('result'):
+                continue  # Not mined yet (only possible in a sweep)
+            with self._wakeup:
+                entry = self._pending.pop(key, None)
+            if entry is not None:
+                entry[0].set_result(_format_receipt(item['result']))
+
+    def stats(self):
+        with self._wakeup:
+            return {
+                "pending": len(self._pending),
+                "blocks_seen": self.blocks_seen,
+                "rpc_batches": self.rpc_batches,
+                "poll_failures": self.poll_failures,
+                "last_error": self.last_error
+            }
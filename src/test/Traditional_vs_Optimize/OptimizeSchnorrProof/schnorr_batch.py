@@ -0,0 +1,124 @@
+import math
+import secrets
+from web3 import Web3
+
+SECURITY_BITS = 40  # A batch holding a bad proof passes with probability at most 2^-SECURITY_BITS
+LEAF_SIZE = 4  # Sub-batches this small are checked proof by proof while bisecting
+FACTOR_SEARCH_LIMIT = 1 << 16  # Trial division bound when looking for the group order's smallest factor
+
+
+class SchnorrStatement:
+    """ One proof to check: g^s == R * y^c (mod p), with y the prover's public value """
+    __slots__ = ('R', 's', 'c', 'y')
+
+    def __init__(self, R, s, c, y):
+        self.R = R
+        self.s = s
+        self.c = c
+        self.y = y
+
+
+# Smallest prime factor of n, or FACTOR_SEARCH_LIMIT when none is below it (a safe lower bound)
+def _smallest_factor(n):
+    factor = 2
+    while factor * factor <= n and factor < FACTOR_SEARCH_LIMIT:
+        if n % factor == 0:
+            return factor
+        factor += 1
+    return n if factor * factor > n else FACTOR_SEARCH_LIMIT
+
+
+# Product of base^exponent mod modulus over many terms, computed as one multi-exponentiation:
+# exponents of equal bases are summed first, so each distinct base is raised only once
+def multi_exp(terms, modulus, order):
+    merged = {}
+    for base, exponent in terms:
+        base %= modulus
+        merged[base] = merged.get(base, 0) + exponent
+
+    result = 1
+    for base, exponent in merged.items():
+        exponent %= order
+        if exponent and base != 1:
+            result = result * pow(base, exponent, modulus) % modulus
+    return result
+
+
+class SchnorrBatchVerifier:
+    """ Checks many Schnorr proofs with random linear combinations instead of one modexp pair each.
+
+    For random weights w_i the batch holds when g^(sum w_i s_i) == prod R_i^w_i * y_i^(w_i c_i),
+    which is one multi-exponentiation. A bad proof survives a round only if its error's order
+    divides its weight, so the check is repeated until the chance of that is below
+    2^-security_bits (1 round for a large prime-order group, 40 for the demo group mod 23).
+    A failed batch is bisected to find the bad proofs. """
+
+    def __init__(self, g, p, order=None, security_bits=SECURITY_BITS, leaf_size=LEAF_SIZE):
+        self.g = g
+        self.p = p
+        self.order = order or p - 1  # Exponents are reduced mod the order; p - 1 is valid for all of Z_p*
+        self.rounds = max(1, math.ceil(security_bits / math.log2(_smallest_factor(self.order))))
+        self.leaf_size = leaf_size
+        self.multi_exps = 0
+        self.single_checks = 0
+
+    def check_one(self, statement):
+        self.single_checks += 1
+        return pow(self.g, statement.s, self.p) == statement.R * pow(statement.y, statement.c, self.p) % self.p
+
+    def check_batch(self, statements):
+        """ True when every statement holds (up to the soundness bound), False when at least one fails """
+        weight_bytes = (self.order.bit_length() + 7) // 8 + 8  # Extra bytes keep the reduction close to uniform
+        for _ in range(self.rounds):
+            self.multi_exps += 1
+            randomness = secrets.token_bytes(weight_bytes * len(statements))
+            g_exponent = 0
+            terms = []
+            for i, statement in enumerate(statements):
+                chunk = randomness[i * weight_bytes:(i + 1) * weight_bytes]
+                weight = int.from_bytes(chunk, 'big') % (self.order - 1) + 1
+                g_exponent += weight * statement.s
+                terms.append((statement.R, weight))
+                terms.append((statement.y, weight * statement.c))
+            terms.append((self.g, -g_exponent))  # Moved to the right-hand side, so the product must be 1
+            if multi_exp(terms, self.p, self.order) != 1:
+                return False
+        return True
+
+    def verify(self, statements):
+        """ Returns one bool per statement, bisecting failed batches down to the bad proofs """
+        statements = list(statements)
+        results = [False] * len(statements)
+        # Values that are 0 mod p are outside the group; reject them before they reach a batch
+        candidates = [
+            i for i, statement in enumerate(statements)
+            if statement.R % self.p and statement.y % self.p
+        ]
+
+        pending = [candidates] if candidates else []
+        while pending:
+            indices = pending.pop()
+            if len(indices) <= self.leaf_size:
+                for i in indices:
+                    results[i] = self.check_one(statements[i])
+            elif self.check_batch([statements[i] for i in indices]):
+                for i in indices:
+                    results[i] = True
+            else:
+                middle = len(indices) // 2
+                pending.append(indices[middle:])
+                pending.append(indices[:middle])
+        return results
+
+    def stats(self):
+        return {"rounds": self.rounds, "multi_exps": self.multi_exps, "single_checks": self.single_checks}
+
+
+# Digest naming a verified batch on-chain: every statement and its result, packed in order
+def batch_digest(statements, results):
+    packed = bytearray()
+    for statement, valid in zip(statements, results):
+        for value in (statement.R, statement.s, statement.c, statement.y):
+            packed += value.to_bytes(32, 'big')
+        packed.append(1 if valid else 0)
+    return Web3.keccak(bytes(packed))
@@ -1,6 +1,7 @@
 import json
 import hashlib
 import random
+from revocation_bitmap import RevocationBitmap
 
 student_did_li = []
 
@@ -15,6 +16,7 @@ def generate_acl(num_entries):
         hashed_email = hashlib.sha256(email.encode()).hexdigest()  # Hash the email
 
         acl_entry = {
+            "index": i,  # Stable bit in revocation.bin; kept with the entry so reordering the file moves nothing
             "student_did": student_did,
             "employer_hashed_email": hashed_email,
             "expiration": 1687581600 + i * 1000,  # Example expiration times (incremented)
@@ -28,7 +30,12 @@ def generate_acl(num_entries):
     with open('acl.json', 'w') as acl_file:
         json.dump({"students": acl_list}, acl_file, indent=4)
 
-    print(f"{num_entries} ACL entries successfully created and stored in acl.json.")
+    # One revocation bit per entry, set for the entries written as invalid
+    revocations = RevocationBitmap.create('revocation.bin', num_entries)
+    revocations.revoke_many(entry["index"] for entry in acl_list if not entry["isValid"])
+    revocations.close()
+
+    print(f"{num_entries} ACL entries successfully created and stored in acl.json (revocations in revocation.bin).")
 
 # Function to create a batch verification payload
 def create_batch_verification_payload(num_entries):
@@ -1,9 +1,16 @@
-from flask import Flask, jsonify, render_template
+from flask import Flask, request, jsonify, render_template
 from web3 import Web3
 import json
 import random
 import hashlib
 import time
+from data_store import DataStore
+from gas_chunks import CALL_GAS_BUDGET, decode_bitmap, gas_bounded_chunks
+from async_verifier import MAX_CONCURRENCY, run_jobs
+from receipt_tracker import ReceiptTracker
+from revocation_bitmap import mirror_revocations
+from schnorr_batch import SchnorrBatchVerifier, SchnorrStatement, batch_digest
+from sender_pool import SenderPool
 
 app = Flask(__name__)
 
@@ -18,24 +25,190 @@ with open('e-transcript/build/contracts/SchnorrSingleVerification.json') as f:
 
 contract = w3.eth.contract(address=contract_address, abi=contract_abi)
 
+# Parsed acl.json / payload, reloaded only when a file changes
+data_store = DataStore()
+
+# Receipts of every transaction the app sends, resolved from new blocks by one background thread
+receipt_tracker = ReceiptTracker(w3)
+receipt_tracker.start()
+
+# Accounts engine=pool spreads verification transactions over, starting at this app's usual sender
+SENDER_ACCOUNTS = 4
+sender_pool = SenderPool(w3, w3.eth.accounts[:SENDER_ACCOUNTS], tracker=receipt_tracker)
+
 # Static variables for Schnorr proof
 G = 2  # Generator
 P = 23  # Prime modulus
 
+# Checks engine=batch's Schnorr proofs off-chain with random linear combinations
+schnorr_verifier = SchnorrBatchVerifier(G, P)
+
 @app.route('/', methods=['GET'])
 def batch_ver_page():
     # Render the HTML form page for batch verification
     return render_template('batch_ver.html')
 
+# Run a view function with eth_call and report its gas with estimate_gas instead of mining it
+def call_view(contract_function, estimate_gas=True):
+    tx_params = {'from': w3.eth.accounts[0]}
+    result = contract_function.call(tx_params)
+    gas_used = contract_function.estimate_gas(tx_params) if estimate_gas else 0
+    return result, gas_used
+
+# Read each pending student's challenge and verify its proof concurrently on the asyncio engine
+def verify_proofs_async(pending_students, verify_mode, estimate_gas, max_concurrency):
+    async def verify_one(engine, pending):
+        _, _, r, hashed_secret, proof_base = pending
+        challenge, _ = await engine.call('getChallenge', proof_base['R'], estimate_gas=False)
+        proof = {**proof_base, 's': (r + challenge * hashed_secret) % (P - 1), 'c': challenge}
+        if verify_mode == 'transact':
+            return await engine.transact('verifySchnorrProof', proof)
+        return await engine.call('verifySchnorrProof', proof, estimate_gas=estimate_gas)
+
+    return run_jobs(
+        w3.provider.endpoint_uri, contract_address, contract_abi,
+        verify_one, pending_students,
+        sender_index=0, gas=None, max_concurrency=max_concurrency
+    )
+
+# Read each pending student's challenge and verify its proof on a thread pool,
+# with the transactions spread over the sender pool's accounts
+def verify_proofs_pooled(pending_students, verify_mode, estimate_gas, senders):
+    def verify_one(pending):
+        _, _, r, hashed_secret, proof_base = pending
+        challenge = contract.functions.getChallenge(proof_base['R']).call()
+        proof = {**proof_base, 's': (r + challenge * hashed_secret) % (P - 1), 'c': challenge}
+        verify_call = contract.functions.verifySchnorrProof(proof)
+        if verify_mode == 'transact':
+            receipt = sender_pool.transact(verify_call, senders=senders)
+            return receipt['status'] == 1, receipt['gasUsed']
+        return call_view(verify_call, estimate_gas)
+
+    return sender_pool.map(verify_one, pending_students, senders=senders)
+
+# getChallenge is keccak256(R) mod p, so the batched engines derive the challenge locally instead of reading it per proof
+def local_challenge(R):
+    return int.from_bytes(Web3.solidity_keccak(['uint256'], [R]), 'big') % P
+
+# Check the pending students' proofs off-chain in one random-linear-combination batch and,
+# with attest, post a single attestation for the whole batch. Returns (results, attestation gas used).
+def verify_proofs_batched(pending_students, attest):
+    statements = []
+    for _, _, r, hashed_secret, proof_base in pending_students:
+        challenge = local_challenge(proof_base['R'])
+        s = (r + challenge * hashed_secret) % (P - 1)
+        # Public value the contract computes as g^employerHashedEmail mod p
+        public_value = pow(G, proof_base['employerHashedEmail'], P)
+        statements.append(SchnorrStatement(proof_base['R'], s, challenge, public_value))
+    valid = schnorr_verifier.verify(statements)
+
+    attestation_gas_used = 0
+    if attest and statements:
+        # Only the contract's issuer (its deployer) may attest batches
+        issuer = contract.functions.issuer().call()
+        tx_hash = contract.functions.attestSchnorrBatch(
+            batch_digest(statements, valid), len(statements), sum(valid)
+        ).transact({'from': issuer})
+        receipt = receipt_tracker.wait(tx_hash)
+        if receipt['status'] != 1:
+            raise RuntimeError("attestSchnorrBatch reverted")
+        attestation_gas_used = receipt['gasUsed']
+    return [(is_valid, 0) for is_valid in valid], attestation_gas_used
+
+# Verify the pending students' proofs with verifySchnorrProofs, as few proofs per call as the gas
+# budget allows. Each proof is charged an equal share of its chunk's gas.
+def verify_proofs_multi(pending_students, verify_mode, gas_budget):
+    proofs = []
+    for _, _, r, hashed_secret, proof_base in pending_students:
+        challenge = local_challenge(proof_base['R'])
+        proofs.append({**proof_base, 's': (r + challenge * hashed_secret) % (P - 1), 'c': challenge})
+
+    results = []
+    build_call = contract.functions.verifySchnorrProofs
+    for chunk, verify_call, gas_used in gas_bounded_chunks(build_call, proofs, w3.eth.accounts[0], gas_budget):
+        valid = decode_bitmap(verify_call.call({'from': w3.eth.accounts[0]}), len(chunk))
+        if verify_mode == 'transact':
+            # A mined transaction cannot return the bitmap, so it only supplies the real gas used
+            receipt = receipt_tracker.wait(verify_call.transact({'from': w3.eth.accounts[0], 'gas': gas_budget}))
+            gas_used = receipt['gasUsed']
+        share, remainder = divmod(gas_used, len(chunk))
+        results.extend((is_valid, share + (remainder if i == 0 else 0)) for i, is_valid in enumerate(valid))
+    return results
+
+@app.route('/receipt_tracker/stats', methods=['GET'])
+def receipt_tracker_stats():
+    # Report pending receipts and how many blocks and RPC batches resolved them
+    return jsonify(receipt_tracker.stats())
+
+@app.route('/sender_pool/stats', methods=['GET'])
+def sender_pool_stats():
+    # Report each pool account's next nonce and in-flight transactions
+    return jsonify(sender_pool.stats())
+
+@app.route('/acl/revoke', methods=['POST'])
+def acl_revoke():
+    # Set the revocation bits of the given comma-separated DIDs; mirror=1 also writes the changed words on-chain
+    try:
+        student_dids = [did.strip() for did in request.values.get('student_dids', '').split(',') if did.strip()]
+        revoked = data_store.revoke(student_dids)
+        gas_used = 0
+        if request.values.get('mirror', '0') == '1':
+            # Only the contract's issuer (its deployer) may write revocation words
+            issuer = contract.functions.issuer().call()
+            gas_used = mirror_revocations(contract, data_store.revocations, issuer, receipt_tracker.wait)
+        data_store.revocations.flush()
+        return jsonify({"status": "success", "revoked": revoked, "gas_used": gas_used})
+    except Exception as e:
+        return jsonify({"status": "failed", "message": str(e)})
+
+@app.route('/acl/mirror', methods=['POST'])
+def acl_mirror():
+    # Write every revocation word changed since the last mirror to the contract;
+    # full=1 rewrites every non-zero word as well (e.g. after redeploying the contract)
+    try:
+        full = request.values.get('full', '0') == '1'
+        issuer = contract.functions.issuer().call()
+        gas_used = mirror_revocations(contract, data_store.revocations, issuer, receipt_tracker.wait, full=full)
+        return jsonify({"status": "success", "gas_used": gas_used})
+    except Exception as e:
+        return jsonify({"status": "failed", "message": str(e)})
+
+@app.route('/acl/prune', methods=['POST'])
+def acl_prune():
+    # Drop every ACL entry that expired before `now` (the current time by default)
+    try:
+        now = float(request.values['now']) if 'now' in request.values else None
+        pruned = data_store.prune_expired(now)
+        return jsonify({"status": "success", "pruned": pruned, "remaining": len(data_store.acl.get())})
+    except Exception as e:
+        return jsonify({"status": "failed", "message": str(e)})
+
 @app.route('/batch_verify', methods=['POST'])
 def batch_verify():
     try:
-        # Load data
-        with open('acl.json', 'r') as f:
-            acl_data = json.load(f)['students']
+        # Load data (parsed once and re-parsed only when a file changes on disk)
+        acl_data = data_store.acl.get()
+        students_data = data_store.payload.get()
 
-        with open('batch_verification_payload.json', 'r') as f:
-            students_data = json.load(f)['students']
+        # "call" verifies with eth_call, "transact" mines one transaction per proof
+        verify_mode = request.values.get('verify_mode', 'call')
+        # In call mode, gas is reported from estimate_gas; set estimate_gas=0 to skip it
+        estimate_gas = request.values.get('estimate_gas', '1') != '0'
+        # "sync" verifies one proof after another, "async" runs them concurrently on AsyncWeb3,
+        # "pool" runs them on threads with the transactions spread over several sender accounts,
+        # "batch" checks them off-chain together (attest=0 skips the one attestation transaction),
+        # "multi" sends them to verifySchnorrProofs in chunks of at most gas_budget gas
+        engine = request.values.get('engine', 'sync')
+        gas_budget = int(request.values.get('gas_budget', CALL_GAS_BUDGET))
+        attest = request.values.get('attest', '1') != '0'
+        max_concurrency = int(request.values.get('max_concurrency', MAX_CONCURRENCY))
+        # "pool" spreads the verification transactions over this many of the pool's accounts
+        senders = int(request.values.get('senders', SENDER_ACCOUNTS))
+        # check_expiration=1 also treats ACL entries whose expiration has passed as invalid
+        now = time.time() if request.values.get('check_expiration', '0') == '1' else None
+        # Revoked entries of this batch, checked a 256-index bitmap word at a time
+        revoked = data_store.revoked_among(acl_data.get(student.student_did) for student in students_data)
+        pending_students = []  # (result slot, DID, nonce, hashed secret, proof fields) for the async and pool engines
 
         # Start timing the batch verification process
         start_time = time.time()
@@ -46,13 +219,14 @@ def batch_verify():
 
         # Loop through each student's data
         for student in students_data:
-            secret = student['email'].strip().lower()  # Employer's unhashed email
-            student_did = student['student_did']  # Student's DID
+            secret = student.email.strip().lower()  # Employer's unhashed email
+            student_did = student.student_did  # Student's DID
 
             # Get the corresponding ACL entry
-            acl_entry = next((item for item in acl_data if item['student_did'] == student_did), None)
+            acl_entry = acl_data.get(student_did)
 
-            if acl_entry is None or not acl_entry['isValid']:
+            if (acl_entry is None or not acl_entry.is_valid or acl_entry.index in revoked
+                    or (now is not None and acl_entry.expiration < now)):
                 # Skip invalid or missing ACL entries
                 verification_results.append({
                     'student_did': student_did,
@@ -62,7 +236,7 @@ def batch_verify():
 
             try:
                 # Convert the employer_hashed_email from ACL (hex string to int)
-                employer_hashed_email = int(acl_entry['employer_hashed_email'], 16)  # Hex to int conversion
+                employer_hashed_email = int(acl_entry.employer_hashed_email, 16)  # Hex to int conversion
             except ValueError:
                 # If the employer_hashed_email is not a valid hex, log it
                 verification_results.append({
@@ -79,32 +253,43 @@ def batch_verify():
             r = random.randint(1, P - 1)  # Random nonce
             R = pow(G, r, P)  # R = g^r mod p
 
-            challenge = contract.functions.getChallenge(R).call()  # Get challenge from blockchain
-            s = (r + challenge * hashed_secret) % (P - 1)  # Response
-
-            # Create the proof data
-            proof = {
+            # Proof fields that are known before the challenge is read
+            proof_base = {
                 'R': R,
-                's': s,
                 'g': G,
                 'p': P,
-                'c': challenge,
                 'employerHashedEmail': employer_hashed_email  # Use employer_hashed_email from ACL
             }
 
+            if engine in ('async', 'pool', 'batch', 'multi'):
+                # Keep this student's slot; the engine fills it in after the loop
+                pending_students.append((len(verification_results), student_did, r, hashed_secret, proof_base))
+                verification_results.append(None)
+                continue
+
+            challenge = contract.functions.getChallenge(R).call()  # Get challenge from blockchain
+            s = (r + challenge * hashed_secret) % (P - 1)  # Response
+
+            # Create the proof data
+            proof = {**proof_base, 's': s, 'c': challenge}
+
             try:
-                # Send each proof verification request to the smart contract one by one
-                tx_hash = contract.functions.verifySchnorrProof(proof).transact({'from': w3.eth.accounts[0]})
-                receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+                if verify_mode == 'transact':
+                    # Send each proof verification request to the smart contract one by one
+                    tx_hash = contract.functions.verifySchnorrProof(proof).transact({'from': w3.eth.accounts[0]})
+                    receipt = receipt_tracker.wait(tx_hash)
+                    is_valid = receipt['status'] == 1  # Mined receipts cannot carry the returned boolean
+                    gas_used = receipt['gasUsed']
+                else:
+                    # Run the view function with eth_call and read its real boolean result
+                    is_valid, gas_used = call_view(contract.functions.verifySchnorrProof(proof), estimate_gas)
 
-                # Get the gas used by the transaction
-                gas_used = receipt['gasUsed']
                 cumulative_gas_used += gas_used  # Add to cumulative gas
 
-                # Append the result (True/False) to the verification_results list
+                # Append the result (Valid/Invalid) to the verification_results list
                 verification_results.append({
                     'student_did': student_did,
-                    'result': 'Valid',  # Assuming successful verification
+                    'result': 'Valid' if is_valid else 'Invalid',
                     'gas_used': gas_used  # Gas used for this proof
                 })
             except Exception as e:
@@ -114,6 +299,32 @@ def batch_verify():
                     'result': f"verification failed: {str(e)}"
                 })
 
+        if pending_students:
+            # Read the challenges and verify the proofs concurrently
+            if engine == 'pool':
+                results = verify_proofs_pooled(pending_students, verify_mode, estimate_gas, senders)
+            elif engine == 'batch':
+                results, attestation_gas_used = verify_proofs_batched(pending_students, attest)
+                cumulative_gas_used += attestation_gas_used
+            elif engine == 'multi':
+                results = verify_proofs_multi(pending_students, verify_mode, gas_budget)
+            else:
+                results = verify_proofs_async(pending_students, verify_mode, estimate_gas, max_concurrency)
+            for (slot, student_did, *_), result in zip(pending_students, results):
+                if isinstance(result, Exception):
+                    verification_results[slot] = {
+                        'student_did': student_did,
+                        'result': f"verification failed: {str(result)}"
+                    }
+                    continue
+                is_valid, gas_used = result
+                cumulative_gas_used += gas_used
+                verification_results[slot] = {
+                    'student_did': student_did,
+                    'result': 'Valid' if is_valid else 'Invalid',
+                    'gas_used': gas_used
+                }
+
         # Stop timing the batch verification
         verification_time = time.time() - start_time
 
@@ -0,0 +1,66 @@
+import asyncio
+from web3 import AsyncWeb3, AsyncHTTPProvider
+
+# Default number of students whose contract work may be in flight at the same time
+MAX_CONCURRENCY = 50
+
+
+class AsyncVerificationEngine:
+    """ Runs per-student contract work concurrently on AsyncWeb3, with bounded concurrency """
+
+    def __init__(self, provider_url, contract_address, contract_abi, sender_index=0,
+                 gas=200000000, max_concurrency=MAX_CONCURRENCY, timeout=500):
+        # gas=None lets the node estimate the gas limit of each transaction
+        self.w3 = AsyncWeb3(AsyncHTTPProvider(provider_url, request_kwargs={'timeout': timeout}))
+        self.contract = self.w3.eth.contract(address=contract_address, abi=contract_abi)
+        self.sender_index = sender_index
+        self.gas = gas
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.sender = None
+
+    async def _tx_params(self):
+        if self.sender is None:
+            self.sender = (await self.w3.eth.accounts)[self.sender_index]
+        return {'from': self.sender}
+
+    async def transact(self, fn_name, *args):
+        """ Sends one transaction and waits for its receipt; returns (succeeded, gas used) """
+        tx_params = await self._tx_params()
+        if self.gas:
+            tx_params = {**tx_params, 'gas': self.gas}
+        tx_hash = await self.contract.functions[fn_name](*args).transact(tx_params)
+        receipt = await self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.timeout)
+        return receipt['status'] == 1, receipt['gasUsed']
+
+    async def call(self, fn_name, *args, estimate_gas=True):
+        """ Runs a view function with eth_call; returns (result, estimated gas or 0) """
+        tx_params = await self._tx_params()
+        contract_function = self.contract.functions[fn_name](*args)
+        result = await contract_function.call(tx_params)
+        gas_used = await contract_function.estimate_gas(tx_params) if estimate_gas else 0
+        return result, gas_used
+
+    async def map(self, job, items):
+        """ Runs job(engine, item) for every item, at most max_concurrency at a time.
+        Results keep the order of items; a failing job returns its exception in its slot. """
+        async def run_one(item):
+            async with self.semaphore:
+                return await job(self, item)
+
+        return await asyncio.gather(*(run_one(item) for item in items), return_exceptions=True)
+
+    async def close(self):
+        await self.w3.provider.disconnect()
+
+
+# Run job over items on a fresh engine from synchronous code (e.g. a Flask route)
+def run_jobs(provider_url, contract_address, contract_abi, job, items, **engine_kwargs):
+    async def main():
+        engine = AsyncVerificationEngine(provider_url, contract_address, contract_abi, **engine_kwargs)
+        try:
+            return await engine.map(job, items)
+        finally:
+            await engine.close()
+
+    return asyncio.run(main())
@@ -13,6 +13,39 @@ contract SchnorrSingleVerification {
         uint256 employerHashedEmail; // employer's hashed email provided as uint256
     }
 
+    // Revocation bitmap mirrored from revocation.bin: bit (i % 256) of word (i / 256) is set when student index i is revoked.
+    // It is a public record for other readers (isRevoked); the proof checks below do not consult it, since the
+    // app drops revoked entries using revocation.bin before it builds the proofs.
+    mapping(uint256 => uint256) public revocationWords;
+    address public issuer; // Only the deploying account may change revocations or attest batches
+
+    event SchnorrBatchAttested(bytes32 batchDigest, uint256 proofCount, uint256 validCount);
+
+    constructor() {
+        issuer = msg.sender;
+    }
+
+    // Overwrite whole bitmap words with the app's current copy
+    function setRevocationWords(uint256[] calldata wordIndices, uint256[] calldata words) public {
+        require(msg.sender == issuer, "Only the issuer can update revocations");
+        require(wordIndices.length == words.length, "Word indices and words must have the same length");
+        for (uint256 i = 0; i < wordIndices.length; i++) {
+            revocationWords[wordIndices[i]] = words[i];
+        }
+    }
+
+    // Records the outcome of a batch of proofs verified off-chain, in one transaction instead of one per proof
+    function attestSchnorrBatch(bytes32 batchDigest, uint256 proofCount, uint256 validCount) public {
+        require(msg.sender == issuer, "Only the issuer can attest batches");
+        require(validCount <= proofCount, "More valid proofs than proofs");
+        emit SchnorrBatchAttested(batchDigest, proofCount, validCount);
+    }
+
+    // One storage read answers the revocation state of 256 consecutive student indices
+    function isRevoked(uint256 index) public view returns (bool) {
+        return ((revocationWords[index >> 8] >> (index & 255)) & 1) == 1;
+    }
+
     // Function to generate a challenge based on commitment R
     function getChallenge(uint256 R) public pure returns (uint256) {
         return uint256(keccak256(abi.encodePacked(R))) % 23;
@@ -20,14 +53,45 @@ contract SchnorrSingleVerification {
 
     // Function to verify a single Schnorr proof
     function verifySchnorrProof(SchnorrProof memory proofData) public view returns (bool) {
-        // Schnorr proof verification: g^s mod p == R * g^hashed_email^c mod p
-        uint256 lhs = modExp(proofData.g, proofData.s, proofData.p); // Left-hand side: g^s mod p
-
         // Precompute the hashed email's exponentiation
         uint256 hashedEmailExp = modExp(proofData.g, proofData.employerHashedEmail, proofData.p);
 
+        return checkProof(proofData.R, proofData.s, proofData.g, proofData.p, proofData.c, hashedEmailExp);
+    }
+
+    // Function to verify many Schnorr proofs in one call; bit (i % 256) of word (i / 256) is set when proofs[i] is valid.
+    // g^hashed_email is only recomputed when the employer or group changes from the previous proof.
+    function verifySchnorrProofs(SchnorrProof[] calldata proofs) public view returns (uint256[] memory) {
+        uint256[] memory bitmap = new uint256[]((proofs.length + 255) / 256);
+        uint256 lastG;
+        uint256 lastP;
+        uint256 lastEmail;
+        uint256 hashedEmailExp;
+
+        for (uint256 i = 0; i < proofs.length; i++) {
+            SchnorrProof calldata proofData = proofs[i];
+            if (proofData.p < 2) {
+                continue; // No group; reject this proof without reverting the batch
+            }
+            if (i == 0 || proofData.g != lastG || proofData.p != lastP || proofData.employerHashedEmail != lastEmail) {
+                lastG = proofData.g;
+                lastP = proofData.p;
+                lastEmail = proofData.employerHashedEmail;
+                hashedEmailExp = modExp(lastG, lastEmail, lastP);
+            }
+            if (checkProof(proofData.R, proofData.s, proofData.g, proofData.p, proofData.c, hashedEmailExp)) {
+                bitmap[i >> 8] |= uint256(1) << (i & 255);
+            }
+        }
+        return bitmap;
+    }
+
+    // Schnorr proof verification: g^s mod p == R * (g^hashed_email)^c mod p
+    function checkProof(uint256 R, uint256 s, uint256 g, uint256 p, uint256 c, uint256 hashedEmailExp) internal pure returns (bool) {
+        uint256 lhs = modExp(g, s, p); // Left-hand side: g^s mod p
+
         // Right-hand side: R * (g^hashed_email)^c mod p
-        uint256 rhs = (proofData.R * modExp(hashedEmailExp, proofData.c, proofData.p)) % proofData.p;
+        uint256 rhs = mulmod(R, modExp(hashedEmailExp, c, p), p); // mulmod cannot overflow, so a large R only fails its own proof
 
         // Return true if the proof is valid, false otherwise
         return (lhs == rhs);
@@ -0,0 +1,159 @@
+import mmap
+import os
+import threading
+
+WORD_BITS = 256  # Bits per on-chain uint256 word
+WORD_BYTES = WORD_BITS // 8
+MIRROR_WORDS_PER_TX = 256  # Words written per setRevocationWords transaction
+
+
+class RevocationBitmap:
+    """ One revocation bit per student index (the "index" field of each acl.json entry), kept in a small file.
+
+    Bit i sits in byte i // 8, least significant bit first, so each 32-byte slice read as a
+    little-endian integer is exactly the contract's revocationWords[i // 256]. Revoking or
+    checking an index touches only its byte; a clear bit means the entry is still valid. """
+
+    def __init__(self, path, capacity=WORD_BITS):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._write_empty(path, capacity)
+        self._open()
+        # Words changed since they were last mirrored on-chain. Bits set before this process opened
+        # the file (by acl_create.py or an earlier run) may never have been mirrored, so every
+        # non-zero word starts out dirty.
+        self.dirty_words = set(self._nonzero_words())
+
+    @staticmethod
+    def _write_empty(path, capacity):
+        words = max(1, -(-capacity // WORD_BITS))
+        with open(path, 'wb') as f:
+            f.truncate(words * WORD_BYTES)
+
+    @classmethod
+    def create(cls, path, capacity):
+        """ Writes a fresh bitmap with every index valid """
+        cls._write_empty(path, capacity)
+        return cls(path)
+
+    def _open(self):
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = len(self._map) * 8
+
+    def _grow(self, index):
+        # Extend the file by whole words until index fits; new bits read as valid
+        words = index // WORD_BITS + 1
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(words * WORD_BYTES)
+        self._file.close()
+        self._open()
+
+    def _set_bits(self, indices, revoked):
+        changed = 0
+        with self._lock:
+            for index in indices:
+                if index >= self.capacity:
+                    if not revoked:
+                        continue  # Beyond the file means valid already
+                    self._grow(index)
+                byte, bit = index >> 3, 1 << (index & 7)
+                if bool(self._map[byte] & bit) != revoked:
+                    self._map[byte] ^= bit
+                    self.dirty_words.add(index // WORD_BITS)
+                    changed += 1
+        return changed
+
+    def revoke_many(self, indices):
+        """ Sets the revocation bit of every index and returns how many were newly revoked """
+        return self._set_bits(indices, True)
+
+    def restore_many(self, indices):
+        """ Clears the revocation bit of every index and returns how many were restored """
+        return self._set_bits(indices, False)
+
+    # Reads take the lock too, since _grow closes and re-maps the file under it
+
+    def is_revoked(self, index):
+        with self._lock:
+            return index < self.capacity and bool(self._map[index >> 3] & (1 << (index & 7)))
+
+    def word(self, word_index):
+        """ The uint256 word covering indices [256 * word_index, 256 * word_index + 256) """
+        with self._lock:
+            return self._word(word_index)
+
+    def _word(self, word_index):
+        offset = word_index * WORD_BYTES
+        if offset >= len(self._map):
+            return 0
+        return int.from_bytes(self._map[offset:offset + WORD_BYTES], 'little')
+
+    def revoked_among(self, indices):
+        """ Returns the revoked subset of indices, reading each 256-index word once """
+        by_word = {}
+        for index in indices:
+            by_word.setdefault(index // WORD_BITS, []).append(index)
+
+        revoked = set()
+        with self._lock:
+            for word_index, members in by_word.items():
+                word = self._word(word_index)
+                if word == 0:
+                    continue  # No revocations anywhere in this word
+                revoked.update(index for index in members if word >> (index % WORD_BITS) & 1)
+        return revoked
+
+    def nonzero_words(self):
+        """ Indices of every word holding at least one revocation """
+        with self._lock:
+            return self._nonzero_words()
+
+    def _nonzero_words(self):
+        return [word_index for word_index in range(len(self._map) // WORD_BYTES) if self._word(word_index)]
+
+    def take_dirty_words(self, full=False):
+        """ Returns the words to mirror and clears the dirty set; full also returns every non-zero word """
+        with self._lock:
+            dirty = self.dirty_words.union(self._nonzero_words()) if full else self.dirty_words
+            self.dirty_words = set()
+            return sorted(dirty)
+
+    def mark_dirty(self, word_indices):
+        with self._lock:
+            self.dirty_words.update(word_indices)
+
+    def flush(self):
+        with self._lock:
+            self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+
+# Writes the bitmap words changed since the last mirror to the contract's revocationWords;
+# full also rewrites every non-zero word, e.g. for a freshly deployed contract.
+# The mirror is a public record for other readers (isRevoked); batch_verify checks revocation.bin itself.
+# Returns the gas used; words whose transaction fails are marked dirty again.
+def mirror_revocations(contract, bitmap, sender, wait, words_per_tx=MIRROR_WORDS_PER_TX, full=False):
+    dirty = bitmap.take_dirty_words(full)
+    gas_used = 0
+    for start in range(0, len(dirty), words_per_tx):
+        word_indices = dirty[start:start + words_per_tx]
+        try:
+            tx_hash = contract.functions.setRevocationWords(
+                word_indices, [bitmap.word(word_index) for word_index in word_indices]
+            ).transact({'from': sender})
+            receipt = wait(tx_hash)
+            if receipt['status'] != 1:
+                raise RuntimeError("setRevocationWords reverted")
+        except Exception:
+            bitmap.mark_dirty(dirty[start:])
+            raise
+        gas_used += receipt['gasUsed']
+    return gas_used
@@ -0,0 +1,151 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from web3.exceptions import ContractLogicError, TimeExhausted
+
+MAX_IN_FLIGHT = 4  # Transactions one account may have sent but not yet mined
+RECEIPT_TIMEOUT = 120  # Seconds before a transaction is treated as dropped
+SEND_ATTEMPTS = 3  # Sends per transaction, counting resends after a nonce error or a drop
+
+
+class _Account:
+    """ Local nonce and in-flight count of one sender account """
+    __slots__ = ('address', 'nonce', 'in_flight', 'sent', 'resyncs', 'gap_fills', 'lock')
+
+    def __init__(self, address):
+        self.address = address
+        self.nonce = None  # Next nonce to hand out, read from the node on first use
+        self.in_flight = 0
+        self.sent = 0
+        self.resyncs = 0
+        self.gap_fills = 0
+        self.lock = threading.Lock()
+
+
+class SenderPool:
+    """ Spreads transactions over several accounts, each with a locally tracked nonce.
+
+    Every account has at most max_in_flight unmined transactions. Nonces are counted up
+    locally instead of being fetched per transaction. A nonce whose send is rejected or
+    dropped is handed out again when no later nonce has gone out yet; otherwise other
+    threads' transactions wait behind it, so it is filled with a no-op self-transfer.
+    The counter is never moved back below nonces other threads still hold. """
+
+    def __init__(self, w3, accounts, max_in_flight=MAX_IN_FLIGHT, timeout=RECEIPT_TIMEOUT, tracker=None):
+        if not accounts:
+            raise ValueError("Sender pool needs at least one account")
+        self.w3 = w3
+        self.accounts = [_Account(address) for address in accounts]
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        # A ReceiptTracker resolves receipts from new blocks; without one each receipt is polled
+        self._wait = tracker.wait if tracker is not None else w3.eth.wait_for_transaction_receipt
+        self._available = threading.Condition()
+
+    def _acquire(self, senders):
+        # Take an in-flight slot on the least busy of the first `senders` accounts
+        candidates = self.accounts[:senders or len(self.accounts)]
+        with self._available:
+            while True:
+                account = min(candidates, key=lambda candidate: candidate.in_flight)
+                if account.in_flight < self.max_in_flight:
+                    account.in_flight += 1
+                    return account
+                self._available.wait()
+
+    def _release(self, account):
+        with self._available:
+            account.in_flight -= 1
+            self._available.notify()
+
+    def _next_nonce(self, account):
+        with account.lock:
+            if account.nonce is None:
+                account.nonce = self.w3.eth.get_transaction_count(account.address, 'pending')
+            nonce = account.nonce
+            account.nonce += 1
+            return nonce
+
+    def _resync(self, account):
+        # Catch up with the node after another sender used the account (a "nonce too low" rejection).
+        # With other sends in flight the counter only moves forward, past the nonces they hold.
+        with account.lock:
+            pending = self.w3.eth.get_transaction_count(account.address, 'pending')
+            account.nonce = pending if account.in_flight == 1 else max(account.nonce, pending)
+            account.resyncs += 1
+
+    def _return_nonce(self, account, nonce):
+        # A nonce that was handed out but not used by the node leaves a gap later nonces wait behind
+        with account.lock:
+            if account.nonce == nonce + 1:
+                account.nonce = nonce  # Nothing later went out, so the next send simply takes it
+                return
+        try:
+            self.w3.eth.send_transaction({'from': account.address, 'to': account.address, 'value': 0, 'nonce': nonce})
+            account.gap_fills += 1
+        except Exception:
+            pass  # The nonce was used after all (e.g. a reverted transaction was mined)
+
+    def transact(self, contract_function, gas=None, senders=None):
+        """ Sends a contract transaction from the pool and returns its receipt """
+        account = self._acquire(senders)
+        try:
+            for attempt in range(SEND_ATTEMPTS):
+                nonce = self._next_nonce(account)
+                tx_params = {'from': account.address, 'nonce': nonce}
+                if gas is not None:
+                    tx_params['gas'] = gas
+                try:
+                    tx_hash = contract_function.transact(tx_params)
+                except ContractLogicError:
+                    # The call reverts; resending cannot help, and the nonce was never used
+                    self._return_nonce(account, nonce)
+                    raise
+                except Exception as e:
+                    if 'nonce too low' in str(e).lower():
+                        self._resync(account)  # Another sender already used this nonce
+                    else:
+                        self._return_nonce(account, nonce)  # Rejected before it reached the pool
+                    if attempt + 1 == SEND_ATTEMPTS:
+                        raise
+                    continue
+
+                account.sent += 1
+                try:
+                    return self._wait(tx_hash, timeout=self.timeout)
+                except TimeExhausted:
+                    # Dropped by the node: its nonce is free again, so fill it and send once more
+                    self._return_nonce(account, nonce)
+                    if attempt + 1 == SEND_ATTEMPTS:
+                        raise
+        finally:
+            self._release(account)
+
+    def map(self, job, items, senders=None):
+        """ Runs job(item) for every item on enough threads to keep the chosen accounts busy.
+        Results keep the order of items; a failed job returns its exception instead. """
+        senders = min(senders or len(self.accounts), len(self.accounts))
+        items = list(items)
+        if not items:
+            return []
+
+        def run(item):
+            try:
+                return job(item)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(len(items), senders * self.max_in_flight)) as pool:
+            return list(pool.map(run, items))
+
+    def stats(self):
+        return [
+            {
+                "address": account.address,
+                "next_nonce": account.nonce,
+                "in_flight": account.in_flight,
+                "sent": account.sent,
+                "resyncs": account.resyncs,
+                "gap_fills": account.gap_fills
+            }
+            for account in self.accounts
+        ]
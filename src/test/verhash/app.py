@@ -4,6 +4,9 @@ import json
 import os
 import random
 import time
+from hash_index import HashIndex, hashes_exist
+from receipt_tracker import ReceiptTracker
+from rpc_batch import ReadError, batch_call
 
 app = Flask(__name__)
 
@@ -21,6 +24,17 @@ with open("blockchain/build/contracts/HashStorage.json", "r") as file:
 contract_address = "0x678e573a625d4fbbddC6D2C9a814e01D90D831c9"  # Replace with your deployed contract address
 contract = web3.eth.contract(address=contract_address, abi=contract_data["abi"])
 
+# Number of hashExists reads sent per JSON-RPC batch request
+READ_CHUNK_SIZE = 200
+
+# Receipts of the storage transactions, resolved from new blocks by one background thread
+receipt_tracker = ReceiptTracker(web3)
+receipt_tracker.start()
+
+# Local mirror of the stored hashes; compare_shuffled answers from it instead of scanning on-chain
+hash_index = HashIndex(web3, contract, read_chunk_size=READ_CHUNK_SIZE)
+SPOT_CHECK_SIZE = 20  # Hashes confirmed on-chain in spot_check mode
+
 
 @app.route("/")
 def index():
@@ -39,12 +53,15 @@ def store_hashes_once():
             data = json.load(file)
             hashes = data["hashes"]
 
-        # Split hashes into chunks of 50 and store them across blocks
+        # Split hashes into chunks of 50 and store them across blocks;
+        # every chunk is sent first and the receipts are collected together
+        tx_hashes = []
         for i in range(0, len(hashes), 50):
             chunk = hashes[i:i + 50]
             print(f"Storing chunk: {chunk}")  # Debug log
-            tx = contract.functions.storeBlock(chunk).transact({'from': web3.eth.accounts[0]})
-            web3.eth.wait_for_transaction_receipt(tx)
+            tx_hashes.append(contract.functions.storeBlock(chunk).transact({'from': web3.eth.accounts[0]}))
+        receipt_tracker.wait_all(tx_hashes)
+        hash_index.sync()
 
         return jsonify({"message": f"{len(hashes)} hashes successfully stored in {len(hashes) // 50 + (1 if len(hashes) % 50 > 0 else 0)} block(s)!"})
     except Exception as e:
@@ -68,30 +85,80 @@ def compare_shuffled(size):
         random.shuffle(shuffled_hashes)
         subset = shuffled_hashes[:size]
 
-        # Compare each hash using the smart contract
-        start_time = time.time()
-        missing_hashes = []
-        for h in subset:
-            exists = contract.functions.hashExists(h).call()
-            if not exists:
-                missing_hashes.append(h)
-        end_time = time.time()
+        # mode=index (default) answers from the local mirror, mode=spot_check also confirms a random
+        # sample on-chain, mode=batch checks the whole subset with the contract's bitmap query,
+        # and mode=chain calls hashExists for every hash
+        mode = request.args.get("mode", "index")
+        read_chunk_size = int(request.args.get("read_chunk_size", READ_CHUNK_SIZE))
+        extra = {}
+        if mode in ("index", "spot_check"):
+            sync_start = time.time()
+            extra["synced_hashes"] = hash_index.sync()
+            extra["sync_time"] = time.time() - sync_start
+
+            start_time = time.time()
+            missing_hashes = hash_index.missing(subset)
+            end_time = time.time()
+
+            if mode == "spot_check":
+                sample_size = int(request.args.get("sample_size", SPOT_CHECK_SIZE))
+                extra["spot_check_mismatches"] = hash_index.spot_check(subset, sample_size)
+        elif mode == "batch":
+            start_time = time.time()
+            missing_hashes = [h for h, exists in zip(subset, hashes_exist(web3, contract, subset)) if not exists]
+            end_time = time.time()
+        elif mode == "chain":
+            # Batch the reads into few round trips
+            start_time = time.time()
+            missing_hashes = []
+            results = batch_call(web3, contract, 'hashExists', [(h,) for h in subset], chunk_size=read_chunk_size)
+            for h, exists in zip(subset, results):
+                # A failed read counts as missing, but does not fail the other hashes
+                if isinstance(exists, ReadError) or not exists:
+                    missing_hashes.append(h)
+            end_time = time.time()
+        else:
+            return jsonify({"error": f"Unknown mode: {mode}"}), 400
 
         if missing_hashes:
             return jsonify({
                 "match": False,
                 "missing_hashes": missing_hashes,
-                "time_taken": end_time - start_time
+                "mode": mode,
+                "time_taken": end_time - start_time,
+                **extra
             })
         else:
             return jsonify({
                 "match": True,
                 "message": f"All {size} hashes were found in the blockchain.",
-                "time_taken": end_time - start_time
+                "mode": mode,
+                "time_taken": end_time - start_time,
+                **extra
             })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+@app.route("/hashes_exist", methods=["POST"])
+def check_hashes():
+    try:
+        hashes = request.get_json(force=True).get("hashes", [])
+        start_time = time.time()
+        exists = hashes_exist(web3, contract, hashes)
+        return jsonify({
+            "exists": dict(zip(hashes, exists)),
+            "missing_hashes": [h for h, found in zip(hashes, exists) if not found],
+            "time_taken": time.time() - start_time
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/hash_index/stats", methods=["GET"])
+def hash_index_stats():
+    return jsonify(hash_index.stats())
+
     
 if __name__ == "__main__":
     app.run(debug=True)
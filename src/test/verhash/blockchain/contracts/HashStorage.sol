@@ -11,6 +11,9 @@ contract HashStorage {
     mapping(uint => Block) public blocks;
     uint public blockCount;
 
+    // Membership index: keccak256 of a hash string => id of the block holding it, plus one (0 = not stored)
+    mapping(bytes32 => uint) public hashIndex;
+
     // Store a block with up to 50 hashes
     function storeBlock(string[] memory _hashes) public {
         require(_hashes.length <= 50, "A block can store a maximum of 50 hashes.");
@@ -20,6 +23,10 @@ contract HashStorage {
 
         for (uint i = 0; i < _hashes.length; i++) {
             newBlock.hashes[i] = _hashes[i];
+            bytes32 key = keccak256(bytes(_hashes[i]));
+            if (hashIndex[key] == 0) {
+                hashIndex[key] = blockCount + 1;
+            }
         }
 
         blockCount++;
@@ -33,33 +40,28 @@ contract HashStorage {
 
     // Check if a specific hash exists in any block
     function hashExists(string memory _hash) public view returns (bool) {
-        for (uint i = 0; i < blockCount; i++) {
-            Block storage currentBlock = blocks[i];
-            for (uint j = 0; j < currentBlock.hashCount; j++) {
-                if (keccak256(abi.encodePacked(currentBlock.hashes[j])) == keccak256(abi.encodePacked(_hash))) {
-                    return true;
-                }
+        return hashIndex[keccak256(bytes(_hash))] != 0;
+    }
+
+    // Check many hashes at once; bit (k % 256) of word (k / 256) is set when _hashes[k] is stored
+    function hashesExist(string[] calldata _hashes) public view returns (uint256[] memory) {
+        uint256[] memory bitmap = new uint256[]((_hashes.length + 255) / 256);
+        for (uint k = 0; k < _hashes.length; k++) {
+            if (hashIndex[keccak256(bytes(_hashes[k]))] != 0) {
+                bitmap[k >> 8] |= uint256(1) << (k & 255);
             }
         }
-        return false;
+        return bitmap;
     }
 
-    // // Check if multiple hashes exist in the blockchain
-    // function hashesExist(string[] memory _hashes) public view returns (bool[] memory) {
-    //     bool[] memory results = new bool[](_hashes.length);
-    //     for (uint k = 0; k < _hashes.length; k++) {
-    //         results[k] = false;
-    //         for (uint i = 0; i < blockCount; i++) {
-    //             Block storage currentBlock = blocks[i];
-    //             for (uint j = 0; j < currentBlock.hashCount; j++) {
-    //                 if (keccak256(abi.encodePacked(currentBlock.hashes[j])) == keccak256(abi.encodePacked(_hashes[k]))) {
-    //                     results[k] = true;
-    //                     break;
-    //                 }
-    //             }
-    //             if (results[k]) break;
-    //         }
-    //     }
-    //     return results;
-    // }
+    // Same as hashesExist, but takes the keccak256 keys so the calldata is 32 bytes per hash
+    function keysExist(bytes32[] calldata _keys) public view returns (uint256[] memory) {
+        uint256[] memory bitmap = new uint256[]((_keys.length + 255) / 256);
+        for (uint k = 0; k < _keys.length; k++) {
+            if (hashIndex[_keys[k]] != 0) {
+                bitmap[k >> 8] |= uint256(1) << (k & 255);
+            }
+        }
+        return bitmap;
+    }
 }
@@ -0,0 +1,136 @@
+import hashlib
+import random
+import threading
+from web3 import Web3
+from rpc_batch import ReadError, batch_call
+
+BLOOM_BITS_PER_HASH = 10  # About 1% false positives with 7 probes
+BLOOM_PROBES = 7
+BLOOM_MIN_CAPACITY = 1024
+KEYS_PER_CALL = 2048  # Keys per keysExist call; keeps each eth_call well under the node's gas cap
+
+
+# Key of a hash string in the contract's membership index
+def hash_key(stored_hash):
+    return Web3.keccak(text=stored_hash)
+
+
+# Expand keysExist's uint256 words into one bool per key
+def decode_bitmap(words, count):
+    return [bool(words[k >> 8] >> (k & 255) & 1) for k in range(count)]
+
+
+# Checks every hash with keysExist, a few thousand keys per eth_call and all calls in one JSON-RPC batch
+def hashes_exist(w3, contract, hashes, keys_per_call=KEYS_PER_CALL):
+    chunks = [hashes[i:i + keys_per_call] for i in range(0, len(hashes), keys_per_call)]
+    results = batch_call(w3, contract, 'keysExist', [([hash_key(h) for h in chunk],) for chunk in chunks])
+    exists = []
+    for chunk, words in zip(chunks, results):
+        if isinstance(words, ReadError):
+            raise RuntimeError(f"keysExist failed: {words}")
+        exists.extend(decode_bitmap(words, len(chunk)))
+    return exists
+
+
+class BloomFilter:
+    """ Fixed-size Bloom filter over strings; a miss means the string was never added """
+
+    def __init__(self, capacity=BLOOM_MIN_CAPACITY, bits_per_item=BLOOM_BITS_PER_HASH, probes=BLOOM_PROBES):
+        self.capacity = capacity
+        self.size = max(8, capacity * bits_per_item)
+        self.probes = probes
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: probe i sits at h1 + i * h2
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.probes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class HashIndex:
+    """ Local mirror of every hash stored in HashStorage, for membership checks without contract calls.
+
+    Blocks are append-only and numbered, so sync() only reads the blocks stored since the last
+    sync (with batched getBlock reads). Lookups go through an optional Bloom filter first and
+    then a set. """
+
+    def __init__(self, w3, contract, use_bloom=True, read_chunk_size=200):
+        self.w3 = w3
+        self.contract = contract
+        self.use_bloom = use_bloom
+        self.read_chunk_size = read_chunk_size
+        self.hashes = set()
+        self.bloom = BloomFilter() if use_bloom else None
+        self.synced_blocks = 0  # Contract blocks already mirrored
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """ Pulls in the blocks stored since the last sync and returns how many hashes were added """
+        with self._lock:
+            block_count = self.contract.functions.blockCount().call()
+            if block_count <= self.synced_blocks:
+                return 0
+
+            blocks = batch_call(
+                self.w3, self.contract, 'getBlock',
+                [(block_id,) for block_id in range(self.synced_blocks, block_count)],
+                chunk_size=self.read_chunk_size
+            )
+            added = 0
+            for block_id, block in zip(range(self.synced_blocks, block_count), blocks):
+                if isinstance(block, ReadError):
+                    raise RuntimeError(f"Could not read block {block_id}: {block}")
+                hashes, hash_count = block
+                for stored_hash in hashes[:hash_count]:
+                    if stored_hash not in self.hashes:
+                        self.hashes.add(stored_hash)
+                        self._add_to_bloom(stored_hash)
+                        added += 1
+            self.synced_blocks = block_count
+            return added
+
+    def _add_to_bloom(self, stored_hash):
+        if self.bloom is None:
+            return
+        if self.bloom.count >= self.bloom.capacity:
+            # Rebuild at double the size so the false-positive rate stays put
+            self.bloom = BloomFilter(capacity=self.bloom.capacity * 2)
+            for existing in self.hashes:
+                self.bloom.add(existing)
+        else:
+            self.bloom.add(stored_hash)
+
+    def __contains__(self, candidate):
+        if self.bloom is not None and candidate not in self.bloom:
+            return False  # Definitely never stored
+        return candidate in self.hashes
+
+    def missing(self, candidates):
+        """ Returns the candidates that are not stored, in order """
+        with self._lock:
+            return [candidate for candidate in candidates if candidate not in self]
+
+    def spot_check(self, candidates, sample_size):
+        """ Confirms a random sample of candidates on-chain with one keysExist call.
+        Returns the sampled hashes whose on-chain answer disagrees with the index. """
+        sample = random.sample(list(candidates), min(sample_size, len(candidates)))
+        on_chain = hashes_exist(self.w3, self.contract, sample)
+        return [h for h, exists in zip(sample, on_chain) if exists != (h in self)]
+
+    def stats(self):
+        return {
+            "hashes": len(self.hashes),
+            "synced_blocks": self.synced_blocks,
+            "bloom_bits": self.bloom.size if self.bloom is not None else 0
+        }